@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import logging
+import numpy
+import warnings
+
+from . import series
+
+log = logging.getLogger("collecty.analytics")
+
+# The percentiles that are computed by default
+DEFAULT_PERCENTILES = (95,)
+
+def load(objects, **kwargs):
+	"""
+		Fetches the data of all given objects and stacks the data of
+		all objects that share the same schema into one array with
+		the shape (objects, rows, data sources).
+
+		Returns a list of groups like (objects, step, names, array).
+	"""
+	groups = {}
+
+	for object in objects:
+		start, end, step, names, rows = object.fetch(**kwargs)
+
+		group = groups.setdefault((step, tuple(names)), ([], []))
+
+		group[0].append(object)
+		group[1].append(series.make_array(rows, len(names)))
+
+	ret = []
+
+	for (step, names), (objects, arrays) in groups.items():
+		# Align all series at their end in case the
+		# interval moved on between fetching them
+		length = min(len(a) for a in arrays)
+
+		data = numpy.stack([a[len(a) - length:] for a in arrays])
+
+		ret.append((objects, step, names, data))
+
+	return ret
+
+def compute(data, step, percentiles=DEFAULT_PERCENTILES):
+	"""
+		Computes statistics along the time axis of data as
+		returned by load().
+
+		Returns a dictionary with one array (objects, data sources)
+		for each statistic.
+	"""
+	n = data.shape[1]
+
+	# Find the first and last known value of each series
+	known = ~numpy.isnan(data)
+	has_values = known.any(axis=1)
+
+	first = numpy.argmax(known, axis=1)
+	last = n - 1 - numpy.argmax(known[:, ::-1], axis=1)
+
+	first_values = numpy.take_along_axis(data, first[:, numpy.newaxis], axis=1)[:, 0]
+	last_values = numpy.take_along_axis(data, last[:, numpy.newaxis], axis=1)[:, 0]
+
+	# Series without any values will result in NaN
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore", RuntimeWarning)
+
+		ret = {
+			"mean"   : numpy.nanmean(data, axis=1),
+			"stddev" : numpy.nanstd(data, axis=1),
+			"min"    : numpy.nanmin(data, axis=1),
+			"max"    : numpy.nanmax(data, axis=1),
+		}
+
+		if percentiles:
+			values = numpy.nanpercentile(data, percentiles, axis=1)
+
+			for percentile, value in zip(percentiles, values):
+				ret["p%s" % percentile] = value
+
+		# Compute the average rate of change per second
+		with numpy.errstate(invalid="ignore", divide="ignore"):
+			rate = (last_values - first_values) / ((last - first) * step)
+
+	ret["rate"] = numpy.where(has_values & (last > first), rate, numpy.nan)
+
+	return ret
+
+def analyse(objects, percentiles=DEFAULT_PERCENTILES, **kwargs):
+	"""
+		Computes statistics for all data sources of the given objects
+
+		Returns a dictionary like { object_id : { data_source : { statistic : value } } }
+	"""
+	ret = {}
+
+	# Objects with different schemas cannot be stacked together
+	for objects, step, names, data in load(objects, **kwargs):
+		stats = compute(data, step, percentiles=percentiles)
+
+		for i, object in enumerate(objects):
+			ret[object.id] = {
+				name : { k : float(v[i, j]) for k, v in stats.items() }
+					for j, name in enumerate(names)
+			}
+
+	return ret
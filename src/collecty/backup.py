@@ -0,0 +1,482 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import bz2
+import collections
+import concurrent.futures
+import gzip
+import io
+import json
+import logging
+import lzma
+import os
+import rrdtool
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import time
+
+from .constants import *
+from .i18n import _
+
+# zstd compression is optional
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+log = logging.getLogger("collecty.backup")
+
+DEFAULT_COMPRESSION = "gz"
+
+# Databases are either dumped as XML or copied as they are
+BACKUP_FORMATS = ("xml", "binary")
+
+# The name of the manifest inside the archive
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+RRD_MAGIC  = b"RRD\0"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# File name extensions and their compression methods
+COMPRESSION_EXTENSIONS = (
+	(".tar.gz",  "gz"),
+	(".tgz",     "gz"),
+	(".tar.bz2", "bz2"),
+	(".tar.xz",  "xz"),
+	(".tar.zst", "zst"),
+	(".tar",     "none"),
+)
+
+def _open_gz(f, level):
+	return gzip.GzipFile(fileobj=f, mode="wb",
+		compresslevel=9 if level is None else level)
+
+def _open_bz2(f, level):
+	return bz2.BZ2File(f, mode="wb",
+		compresslevel=9 if level is None else level)
+
+def _open_xz(f, level):
+	return lzma.LZMAFile(f, mode="wb", preset=level)
+
+def _open_zst(f, level):
+	compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+
+	return compressor.stream_writer(f)
+
+COMPRESSION_METHODS = {
+	"gz"   : _open_gz,
+	"bz2"  : _open_bz2,
+	"xz"   : _open_xz,
+	"zst"  : _open_zst,
+	"none" : lambda f, level: f,
+}
+
+def guess_compression(filename):
+	"""
+		Guesses the compression method from the file name
+	"""
+	for extension, compression in COMPRESSION_EXTENSIONS:
+		if filename.endswith(extension):
+			return compression
+
+	return DEFAULT_COMPRESSION
+
+def find_databases(path=DATABASE_DIR):
+	"""
+		Returns a sorted list of all RRD files below path
+	"""
+	databases = []
+
+	for dirpath, directories, files in os.walk(path):
+		# Skip any hidden directories (like those of a running restore)
+		directories[:] = [d for d in directories if not d.startswith(".")]
+
+		for file in files:
+			# Skip any non-RRD files
+			if not file.endswith(".rrd"):
+				continue
+
+			databases.append(os.path.join(dirpath, file))
+
+	return sorted(databases)
+
+def make_arcname(file, path=DATABASE_DIR):
+	return os.path.relpath(file, path)
+
+def map_ordered(executor, func, items, window):
+	"""
+		Like executor.map() but only keeps up to window items
+		in flight so that results do not pile up in memory
+	"""
+	items = iter(items)
+	pending = collections.deque()
+
+	for item in items:
+		pending.append((item, executor.submit(func, item)))
+
+		if len(pending) >= window:
+			break
+
+	while pending:
+		item, future = pending.popleft()
+
+		# Submit the next item before waiting
+		for next_item in items:
+			pending.append((next_item, executor.submit(func, next_item)))
+			break
+
+		yield item, future
+
+def dump(file):
+	"""
+		Returns the XML dump of the given RRD file
+	"""
+	p = subprocess.run(["rrdtool", "dump", file],
+		stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+	if p.returncode:
+		raise OSError(p.stderr.decode(errors="replace").strip())
+
+	return p.stdout
+
+def open_archive(f):
+	"""
+		Opens a (compressed) archive for reading it as a stream
+	"""
+	magic = f.peek(4)[:4]
+
+	if magic == ZSTD_MAGIC:
+		if zstandard is None:
+			raise ValueError(_("zstd compression requires the zstandard module"))
+
+		f = zstandard.ZstdDecompressor().stream_reader(f)
+
+		return tarfile.open(fileobj=f, mode="r|")
+
+	return tarfile.open(fileobj=f, mode="r|*")
+
+def restore_file(args):
+	"""
+		Restores data to path and checks whether the result
+		is a valid RRD database
+	"""
+	data, path = args
+
+	# Binary databases are written as they are
+	if data.startswith(RRD_MAGIC):
+		with open(path, "wb") as f:
+			f.write(data)
+
+	# XML dumps have to be restored
+	else:
+		with tempfile.NamedTemporaryFile(suffix=".xml") as f:
+			f.write(data)
+			f.flush()
+
+			rrdtool.restore(f.name, path)
+
+	# Verify the result
+	rrdtool.info(path)
+
+def load_manifest(filename):
+	"""
+		Reads the manifest of a previous backup
+	"""
+	path = os.path.realpath(filename)
+
+	# Don't open anything else that has been passed
+	if not path.endswith(".manifest") or not os.path.isfile(path):
+		raise ValueError(_("Not a manifest: %s") % filename)
+
+	with open(path) as f:
+		manifest = json.load(f)
+
+	if not manifest.get("version") == MANIFEST_VERSION:
+		raise ValueError(_("Unsupported manifest version in %s") % filename)
+
+	return manifest
+
+
+class Backup(object):
+	"""
+		Writes an archive with all RRD databases
+
+		The databases are either dumped as XML or copied as they are
+		(binary) by a pool of workers and are streamed straight into
+		the (compressed) archive.
+
+		If the manifest of a previous backup is passed as since, only
+		databases that have changed since then will be included.
+	"""
+	def __init__(self, collecty, filename, compression=None, level=None, workers=None,
+			format="xml", since=None):
+		self.collecty = collecty
+		self.filename = filename
+
+		self.compression = compression or guess_compression(filename)
+		if not self.compression in COMPRESSION_METHODS:
+			raise ValueError(_("Unsupported compression method: %s") % self.compression)
+
+		if self.compression == "zst" and zstandard is None:
+			raise ValueError(_("zstd compression requires the zstandard module"))
+
+		if not format in BACKUP_FORMATS:
+			raise ValueError(_("Unsupported backup format: %s") % format)
+
+		self.level = level
+		self.workers = workers or os.cpu_count() or 1
+		self.format = format
+
+		# Load the manifest of the previous backup
+		self.since = load_manifest(since) if since else None
+
+	def __call__(self, job):
+		log.info(_("Backing up to %s...") % self.filename)
+
+		# Write all data to disk first
+		self.collecty.write_queue.commit()
+
+		files = find_databases(self.collecty.database_dir)
+
+		# Take the state of all files before reading any of them, so that
+		# anything that changes while the backup is running will be
+		# included again next time
+		manifest = self._make_manifest(files)
+
+		# Only include what has changed since the last backup
+		if self.since:
+			files = [f for f in files if self._has_changed(f, manifest)]
+
+			log.info(_("%s database(s) have changed since the last backup") % len(files))
+
+		job.total = len(files)
+
+		try:
+			with open(self.filename, "wb") as f:
+				compressor = COMPRESSION_METHODS[self.compression](f, self.level)
+
+				with tarfile.open(fileobj=compressor, mode="w|") as archive:
+					self._write(job, archive, files)
+
+					# Add the manifest
+					self._add(archive, MANIFEST, json.dumps(manifest).encode())
+
+				compressor.close()
+
+			# Store the manifest next to the archive for the next backup
+			with open("%s.manifest" % self.filename, "w") as f:
+				json.dump(manifest, f)
+
+		# Don't leave any partial archives behind
+		except:
+			try:
+				os.unlink(self.filename)
+			except OSError:
+				pass
+
+			raise
+
+		log.info(_("Backup finished"))
+
+	def _make_manifest(self, files):
+		manifest = {
+			"version" : MANIFEST_VERSION,
+			"created" : time.time(),
+			"format"  : self.format,
+			"files"   : {},
+		}
+
+		for file in files:
+			try:
+				st = os.stat(file)
+			except FileNotFoundError:
+				continue
+
+			manifest["files"][make_arcname(file, self.collecty.database_dir)] = {
+				"mtime" : st.st_mtime_ns,
+				"size"  : st.st_size,
+			}
+
+		return manifest
+
+	def _has_changed(self, file, manifest):
+		arcname = make_arcname(file, self.collecty.database_dir)
+
+		return not manifest["files"].get(arcname) == self.since["files"].get(arcname)
+
+	def _read(self, file):
+		"""
+			Returns a copy of the binary RRD file
+		"""
+		# Don't read while rrdtool is writing to this file
+		with self.collecty.write_queue.file_lock(file):
+			with open(file, "rb") as f:
+				return f.read()
+
+	def _write(self, job, archive, files):
+		if self.format == "binary":
+			func = self._read
+		else:
+			func = dump
+
+		# Files are kept in memory, so don't run too far ahead
+		window = self.workers * 2
+
+		with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+			for file, future in map_ordered(executor, func, files, window):
+				try:
+					data = future.result()
+
+				# Skip any databases that cannot be read
+				except OSError as e:
+					log.error(_("Could not back up %s: %s") % (file, e))
+
+				else:
+					log.debug(_("Adding %s to backup...") % file)
+
+					self._add(archive, make_arcname(file, self.collecty.database_dir), data)
+
+				job.advance()
+
+	def _add(self, archive, arcname, data):
+		"""
+			Adds data as a regular file to the archive
+		"""
+		tarinfo = tarfile.TarInfo(arcname)
+		tarinfo.size = len(data)
+		tarinfo.mtime = time.time()
+		tarinfo.mode = 0o644
+
+		archive.addfile(tarinfo, io.BytesIO(data))
+
+
+class Restore(object):
+	"""
+		Restores all RRD databases from an archive
+
+		The databases are restored and verified by a pool of worker
+		processes into a staging directory first. Only when all of
+		them could be restored successfully, they replace the
+		existing databases.
+	"""
+	def __init__(self, collecty, filename, workers=None):
+		self.collecty = collecty
+		self.filename = filename
+
+		self.workers = workers or os.cpu_count() or 1
+
+	def __call__(self, job):
+		log.info(_("Restoring from %s...") % self.filename)
+
+		# Stage everything on the same file system
+		staging = tempfile.mkdtemp(prefix=".restore-", dir=self.collecty.database_dir)
+
+		try:
+			with open(self.filename, "rb") as f:
+				with open_archive(f) as archive:
+					files = self._restore(job, archive, staging)
+
+			self._replace(files, staging)
+
+		finally:
+			shutil.rmtree(staging, ignore_errors=True)
+
+		log.info(_("Restore finished"))
+
+	def _read(self, job, archive, staging):
+		"""
+			Reads all databases from the archive
+		"""
+		for member in archive:
+			# Skip anything that isn't a database (like the manifest)
+			if not member.isfile() or not member.name.endswith(".rrd"):
+				continue
+
+			arcname = os.path.normpath(member.name)
+
+			# Never write outside of the database directory
+			if os.path.isabs(arcname) or arcname.startswith(".."):
+				raise ValueError(_("Invalid file name in archive: %s") % member.name)
+
+			path = os.path.join(staging, arcname)
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+
+			job.total += 1
+
+			yield archive.extractfile(member).read(), path
+
+	def _restore(self, job, archive, staging):
+		files = []
+
+		# Data is kept in memory, so don't run too far ahead
+		window = self.workers * 2
+
+		with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+			items = self._read(job, archive, staging)
+
+			for (data, path), future in map_ordered(executor, restore_file, items, window):
+				arcname = os.path.relpath(path, staging)
+
+				try:
+					future.result()
+				except Exception as e:
+					raise RuntimeError(_("Could not restore %s: %s") % (arcname, e))
+
+				log.debug(_("Restored %s") % arcname)
+
+				files.append(arcname)
+				job.advance()
+
+		return files
+
+	def _replace(self, files, staging):
+		"""
+			Moves all restored databases into place
+		"""
+		# Write all data to disk that has been collected so far
+		self.collecty.write_queue.commit()
+
+		paths = set()
+
+		# Don't let rrdtool write to any files while we are replacing them
+		with self.collecty.write_queue.commit_lock:
+			for arcname in files:
+				path = os.path.join(self.collecty.database_dir, arcname)
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+
+				os.replace(os.path.join(staging, arcname), path)
+				paths.add(path)
+
+			# Anything we remember about the old files is no longer true
+			self.collecty.write_queue.forget(paths)
+
+			for plugin in list(self.collecty.plugins):
+				for object in plugin.get_objects():
+					if object.file in paths:
+						object.reset()
+
+		# All cached graphs are outdated now
+		self.collecty.graph_cache.invalidate()
+
+		log.info(_("Replaced %s database(s)") % len(files))
@@ -0,0 +1,567 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import json
+import logging
+import math
+import numpy
+import os
+import random
+import rrdtool
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from . import daemon
+from . import plugins
+from . import recording
+from . import util
+from .constants import *
+from .i18n import _
+
+log = logging.getLogger("collecty.benchmark")
+
+# Plugins which are not benchmarked unless asked for, because they
+# depend on the network and would only measure its latency
+DEFAULT_EXCLUDE = ("latency",)
+
+# The default dimensions of benchmarked graphs
+DEFAULT_SIZES = ((960, 480),)
+
+# Plugins that read their data through the C extension
+# and therefore cannot be replayed
+NOT_REPLAYABLE = ("df", "disk", "latency", "sensors")
+
+# Render times that have grown by more than this are reported as regressions
+REGRESSION_THRESHOLD = 0.1
+
+INTERFACE_STATISTICS = (
+	"rx_bytes", "tx_bytes",
+	"collisions",
+	"rx_dropped", "tx_dropped",
+	"rx_errors", "tx_errors",
+	"multicast",
+	"rx_packets", "tx_packets",
+)
+
+SNMP = (
+	("Ip", ("Forwarding", "DefaultTTL", "InReceives", "InHdrErrors", "InAddrErrors",
+		"ForwDatagrams", "InUnknownProtos", "InDiscards", "InDelivers", "OutRequests",
+		"OutDiscards", "OutNoRoutes", "ReasmTimeout", "ReasmReqds", "ReasmOKs",
+		"ReasmFails", "FragOKs", "FragFails", "FragCreates")),
+	("Icmp", ("InMsgs", "InErrors", "InCsumErrors", "OutMsgs", "OutErrors")),
+	("Tcp", ("RtoAlgorithm", "RtoMin", "RtoMax", "MaxConn", "ActiveOpens",
+		"PassiveOpens", "AttemptFails", "EstabResets", "CurrEstab", "InSegs",
+		"OutSegs", "RetransSegs", "InErrs", "OutRsts", "InCsumErrors")),
+	("Udp", ("InDatagrams", "NoPorts", "InErrors", "OutDatagrams", "RcvbufErrors",
+		"SndbufErrors", "InCsumErrors", "IgnoredMulti")),
+)
+
+SNMP6 = (
+	"Ip6InReceives", "Ip6InHdrErrors", "Ip6InTooBigErrors", "Ip6InNoRoutes",
+	"Ip6InAddrErrors", "Ip6InUnknownProtos", "Ip6InTruncatedPkts", "Ip6InDiscards",
+	"Ip6InDelivers", "Ip6OutForwDatagrams", "Ip6OutRequests", "Ip6OutDiscards",
+	"Ip6OutNoRoutes", "Ip6ReasmTimeout", "Ip6ReasmReqds", "Ip6ReasmOKs",
+	"Ip6ReasmFails", "Ip6FragOKs", "Ip6FragFails", "Ip6FragCreates",
+	"Icmp6InMsgs", "Icmp6InErrors", "Icmp6OutMsgs", "Icmp6OutErrors",
+	"Udp6InDatagrams", "Udp6NoPorts", "Udp6InErrors", "Udp6OutDatagrams",
+)
+
+def _write(root, path, content):
+	path = os.path.join(root, path.lstrip("/"))
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+
+	with open(path, "w") as f:
+		f.write(content)
+
+def _make_disk_name(n):
+	"""
+		Returns the name of the nth disk (sda, sdb, ..., sdz, sdaa, ...)
+	"""
+	name = ""
+
+	n += 1
+	while n:
+		n, r = divmod(n - 1, 26)
+		name = chr(ord("a") + r) + name
+
+	return "sd%s" % name
+
+def make_tree(root, cpus=4, interfaces=4, irqs=32, disks=2):
+	"""
+		Creates a synthetic procfs and sysfs below root with the given
+		number of processors, network interfaces, interrupts and disks
+	"""
+	# /proc/stat
+	stat = ["cpu  %s" % " ".join("%s" % (n * cpus * 1000) for n in range(1, 11))]
+
+	for cpu in range(cpus):
+		stat.append("cpu%s %s" % (cpu, " ".join("%s" % (n * 1000) for n in range(1, 11))))
+
+	stat += [
+		"intr %s %s" % (irqs * 1000, " ".join("1000" for irq in range(irqs))),
+		"ctxt 123456789",
+		"btime 1700000000",
+		"processes 12345",
+		"procs_running 1",
+		"procs_blocked 0",
+	]
+
+	_write(root, "/proc/stat", "\n".join(stat) + "\n")
+
+	# /proc/meminfo
+	_write(root, "/proc/meminfo", "".join("%-16s%8s kB\n" % ("%s:" % k, v) for k, v in (
+		("MemTotal",  8 * 1024 * 1024),
+		("MemFree",   4 * 1024 * 1024),
+		("Buffers",   256 * 1024),
+		("Cached",    1024 * 1024),
+		("SwapTotal", 2 * 1024 * 1024),
+		("SwapFree",  2 * 1024 * 1024),
+	)))
+
+	# /proc/loadavg
+	_write(root, "/proc/loadavg", "0.50 0.40 0.30 1/200 12345\n")
+
+	# /proc/self/statm
+	_write(root, "/proc/self/statm", "25000 10000 3000 500 0 8000 0\n")
+
+	# /proc/net/snmp
+	snmp = []
+	for type, keys in SNMP:
+		snmp += [
+			"%s: %s" % (type, " ".join(keys)),
+			"%s: %s" % (type, " ".join("%s" % i for i, key in enumerate(keys))),
+		]
+
+	_write(root, "/proc/net/snmp", "\n".join(snmp) + "\n")
+
+	snmp6 = "".join("%-32s%s\n" % (key, i) for i, key in enumerate(SNMP6))
+	_write(root, "/proc/net/snmp6", snmp6)
+
+	# Connection Tracking
+	_write(root, "/proc/sys/net/netfilter/nf_conntrack_count", "1024\n")
+	_write(root, "/proc/sys/net/netfilter/nf_conntrack_max", "65536\n")
+
+	# Processors
+	for cpu in range(cpus):
+		path = "/sys/devices/system/cpu/cpu%s" % cpu
+
+		_write(root, "%s/topology/core_id" % path, "%s\n" % cpu)
+
+		for file, value in (("cur", 2000000), ("min", 800000), ("max", 3000000)):
+			_write(root, "%s/cpufreq/cpuinfo_%s_freq" % (path, file), "%s\n" % value)
+
+	# Network Interfaces
+	for interface in ["lo"] + ["eth%s" % i for i in range(interfaces)]:
+		for file in INTERFACE_STATISTICS:
+			_write(root, "/sys/class/net/%s/statistics/%s" % (interface, file), "123456\n")
+
+		_write(root, "/proc/net/dev_snmp6/%s" % interface, snmp6)
+
+	# Interrupts
+	for irq in range(irqs):
+		os.makedirs(os.path.join(root, "sys/kernel/irq/%s" % irq), exist_ok=True)
+
+	# Disks
+	for disk in range(disks):
+		_write(root, "/sys/block/%s/stat" % _make_disk_name(disk),
+			"%s\n" % " ".join("%s" % (n * 100) for n in range(1, 12)))
+
+
+class Benchmark(object):
+	"""
+		Measures how expensive it is to collect data with each plugin
+
+		The disk, df and sensors plugins query hardware through the
+		C extension and therefore cannot be pointed at a synthetic tree.
+	"""
+	def __init__(self, root=None, plugins=None, rounds=10):
+		self.root = root
+		self.plugins = plugins
+		self.rounds = rounds
+
+	def get_plugins(self):
+		for plugin in sorted(plugins.get(), key=lambda p: p.name):
+			if self.plugins is None:
+				if plugin.name in DEFAULT_EXCLUDE:
+					continue
+
+			elif not plugin.name in self.plugins:
+				continue
+
+			yield plugin
+
+	def run(self):
+		"""
+			Runs the benchmark and returns the results of each plugin
+		"""
+		database_dir = tempfile.mkdtemp(prefix="collecty-benchmark-")
+
+		try:
+			d = daemon.Daemon(root=self.root, database_dir=database_dir, with_bus=False)
+
+			for plugin in self.get_plugins():
+				d.add_plugin(plugin)
+
+			return [self._run(plugin) for plugin in d.plugins]
+
+		finally:
+			shutil.rmtree(database_dir, ignore_errors=True)
+
+	def _run(self, plugin):
+		log.debug(_("Benchmarking %s...") % plugin.name)
+
+		# Discover all objects and create their databases first
+		plugin.collect()
+
+		objects = len(plugin.get_objects())
+
+		time_start = time.perf_counter()
+		cpu_start = time.process_time()
+
+		for i in range(self.rounds):
+			plugin.collect()
+
+		duration = (time.perf_counter() - time_start) / self.rounds
+		cpu = (time.process_time() - cpu_start) / self.rounds
+
+		# Count allocations of one more round
+		tracemalloc.start()
+		try:
+			before = tracemalloc.take_snapshot()
+
+			plugin.collect()
+
+			after = tracemalloc.take_snapshot()
+			current, peak = tracemalloc.get_traced_memory()
+		finally:
+			tracemalloc.stop()
+
+		allocations = sum(s.count_diff for s in after.compare_to(before, "lineno")
+			if s.count_diff > 0)
+
+		return {
+			"plugin"             : plugin.name,
+			"objects"            : objects,
+			"rounds"             : self.rounds,
+			"duration"           : duration,
+			"cpu"                : cpu,
+			"objects_per_second" : objects / duration if duration else None,
+			"allocations"        : allocations,
+			"peak_memory"        : peak,
+		}
+
+
+def make_history(object, duration=7 * 86400, end=None):
+	"""
+		Replaces the database of object with one that is filled
+		with a synthetic daily pattern for the given duration
+	"""
+	step = object.stepsize
+
+	if end is None:
+		end = int(time.time()) - step
+
+	start = end - duration
+
+	if os.path.exists(object.file):
+		os.unlink(object.file)
+
+	rrdtool.create(object.file, "--start", "%s" % (start - step), *object.get_rrd_schema())
+
+	types = [type for name, type in object.rrd_schema_types]
+
+	# Generate the same history for the same object
+	r = random.Random(object.file)
+
+	counters = [0] * len(types)
+	updates = []
+
+	for t in range(start, end, step):
+		values = []
+
+		for i, type in enumerate(types):
+			# Busy during the day, quiet at night
+			value = 0.5 + 0.4 * math.sin(2 * math.pi * (t % 86400) / 86400) + r.uniform(-0.1, 0.1)
+
+			if type in ("COUNTER", "DERIVE"):
+				counters[i] += int(value * 1000 * step)
+				values.append("%s" % counters[i])
+			else:
+				values.append("%.3f" % (value * 100))
+
+		updates.append("%s:%s" % (t, ":".join(values)))
+
+		# Write in batches
+		if len(updates) >= 1000:
+			rrdtool.update(object.file, *updates)
+			updates = []
+
+	if updates:
+		rrdtool.update(object.file, *updates)
+
+
+class GraphBenchmark(Benchmark):
+	"""
+		Measures how long it takes to render the graphs of all
+		templates in all formats, intervals and sizes
+	"""
+	def __init__(self, root=None, plugins=None, rounds=10, formats=None,
+			intervals=None, sizes=None, history=7 * 86400):
+		Benchmark.__init__(self, root=root, plugins=plugins, rounds=rounds)
+
+		self.formats = formats or SUPPORTED_IMAGE_FORMATS
+		self.intervals = intervals or list(util.INTERVALS)
+		self.sizes = sizes or DEFAULT_SIZES
+		self.history = history
+
+	def run(self):
+		"""
+			Runs the benchmark and returns the results
+			of each combination and a summary
+		"""
+		database_dir = tempfile.mkdtemp(prefix="collecty-benchmark-")
+
+		try:
+			d = daemon.Daemon(root=self.root, database_dir=database_dir, with_bus=False)
+
+			for plugin in self.get_plugins():
+				d.add_plugin(plugin)
+
+			# Discover all objects
+			for plugin in d.plugins:
+				plugin.collect()
+
+			# Don't write any samples into the synthetic history
+			d.write_queue.commit()
+
+			for plugin in d.plugins:
+				for object in plugin.get_objects():
+					make_history(object, duration=self.history)
+
+			results, durations = [], []
+
+			time_start = time.perf_counter()
+
+			for plugin in d.plugins:
+				for result in self._run(plugin):
+					durations += result.pop("durations")
+					results.append(result)
+
+			duration = time.perf_counter() - time_start
+
+		finally:
+			shutil.rmtree(database_dir, ignore_errors=True)
+
+		return {
+			"results" : results,
+			"summary" : {
+				"graphs"     : len(durations),
+				"throughput" : len(durations) / duration if duration else None,
+				**self._percentiles(durations),
+			},
+		}
+
+	def _run(self, plugin):
+		objects = plugin.get_objects()
+		if not objects:
+			return
+
+		# Use the first object for all templates
+		object = sorted(objects)[0]
+
+		for template in plugin.templates:
+			for format in self.formats:
+				for interval in self.intervals:
+					for width, height in self.sizes:
+						yield self._render(plugin, template.name, object.id,
+							format=format, interval=interval, width=width, height=height)
+
+	def _render(self, plugin, template_name, object_id, **kwargs):
+		log.debug(_("Rendering %s %s...") % (template_name, kwargs))
+
+		durations = []
+
+		for i in range(self.rounds):
+			time_start = time.perf_counter()
+
+			try:
+				plugin.generate_graph(template_name, object_id=object_id,
+					flush=False, **kwargs)
+
+			except rrdtool.OperationalError as e:
+				log.warning(_("Could not render %s: %s") % (template_name, e))
+				break
+
+			durations.append(time.perf_counter() - time_start)
+
+		return {
+			"template"  : template_name,
+			"object_id" : object_id,
+			"format"    : kwargs.get("format"),
+			"interval"  : kwargs.get("interval"),
+			"width"     : kwargs.get("width"),
+			"height"    : kwargs.get("height"),
+			"durations" : durations,
+			**self._percentiles(durations),
+		}
+
+	@staticmethod
+	def _percentiles(durations):
+		if not durations:
+			return { "p50" : None, "p95" : None, "max" : None }
+
+		p50, p95, max = numpy.percentile(durations, (50, 95, 100))
+
+		return { "p50" : float(p50), "p95" : float(p95), "max" : float(max) }
+
+
+class ReplayBenchmark(Benchmark):
+	"""
+		Replays a recording of collectyd as fast as possible
+	"""
+	def __init__(self, filename, plugins=None, rounds=1):
+		Benchmark.__init__(self, plugins=plugins, rounds=rounds)
+
+		self.filename = filename
+
+	def get_plugins(self):
+		for plugin in Benchmark.get_plugins(self):
+			if plugin.name in NOT_REPLAYABLE:
+				continue
+
+			yield plugin
+
+	def run(self):
+		"""
+			Runs the benchmark and returns the results of each plugin
+			and a summary
+		"""
+		player = recording.Player(self.filename)
+
+		database_dir = tempfile.mkdtemp(prefix="collecty-benchmark-")
+
+		util.set_reader(player)
+		try:
+			d = daemon.Daemon(database_dir=database_dir, with_bus=False)
+
+			for plugin in self.get_plugins():
+				d.add_plugin(plugin)
+
+			plugins = { p.name : p for p in d.plugins }
+
+			results = {}
+
+			time_start = time.perf_counter()
+
+			for i in range(self.rounds):
+				for frame in player.frames:
+					try:
+						plugin = plugins[frame["plugin"]]
+					except KeyError:
+						continue
+
+					player.set_frame(frame)
+
+					t = time.perf_counter()
+					plugin.collect()
+					t = time.perf_counter() - t
+
+					try:
+						result = results[plugin.name]
+					except KeyError:
+						result = results[plugin.name] = {
+							"plugin"   : plugin.name,
+							"frames"   : 0,
+							"duration" : 0,
+						}
+
+					result["frames"] += 1
+					result["duration"] += t
+
+			duration = time.perf_counter() - time_start
+
+			# Include writing everything to disk
+			d.write_queue.commit()
+
+		finally:
+			util.set_reader(None)
+			shutil.rmtree(database_dir, ignore_errors=True)
+
+		results = sorted(results.values(), key=lambda r: r["plugin"])
+
+		for result in results:
+			result["frames_per_second"] = \
+				result["frames"] / result["duration"] if result["duration"] else None
+
+		frames = sum(r["frames"] for r in results)
+
+		return {
+			"results" : results,
+			"summary" : {
+				"frames"            : frames,
+				"duration"          : duration,
+				"frames_per_second" : frames / duration if duration else None,
+			},
+		}
+
+
+def make_key(result):
+	return "%(template)s/%(object_id)s/%(format)s/%(interval)s/%(width)sx%(height)s" % result
+
+def save_baseline(filename, results):
+	"""
+		Stores the results of a graph benchmark to compare later runs against
+	"""
+	with open(filename, "w") as f:
+		json.dump(results, f, indent=4)
+
+def compare(results, filename):
+	"""
+		Compares the median render times with those of a baseline
+
+		Returns a list of (key, baseline, current, change) for every
+		combination that exists in both runs, sorted by the change.
+	"""
+	with open(filename) as f:
+		baseline = json.load(f)
+
+	baseline = { make_key(r) : r for r in baseline.get("results", []) }
+
+	changes = []
+
+	for result in results.get("results", []):
+		key = make_key(result)
+
+		try:
+			before = baseline[key]["p50"]
+		except KeyError:
+			continue
+
+		after = result["p50"]
+
+		if not before or after is None:
+			continue
+
+		changes.append((key, before, after, (after - before) / before))
+
+	return sorted(changes, key=lambda c: c[3], reverse=True)
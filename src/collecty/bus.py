@@ -20,13 +20,18 @@
 ###############################################################################
 
 import dbus
+import dbus.exceptions
 import dbus.mainloop.glib
 import dbus.service
 import gi.repository.GLib
 import gi.repository.GObject
 import logging
+import math
+import os
 import threading
+import time
 
+from . import util
 from .i18n import _
 
 log = logging.getLogger("collecty.bus")
@@ -50,6 +55,10 @@ class Bus(threading.Thread):
 		# Register the GraphGenerator interface
 		self.generator = GraphGenerator(self.collecty)
 
+		# Sends collected samples to subscribed clients
+		self.publisher = Publisher(self.generator)
+		self.generator.publisher = self.publisher
+
 	def run(self):
 		log.debug(_("Bus thread has started"))
 
@@ -70,6 +79,127 @@ class Bus(threading.Thread):
 		# Return when this thread has finished
 		return self.join()
 
+	def publish(self, object, data):
+		"""
+			Sends a newly collected sample to all subscribers
+		"""
+		self.publisher.publish(object, data)
+
+
+class Publisher(object):
+	"""
+		Collects samples of all objects that clients have subscribed to
+		and sends them in one signal per tick.
+	"""
+	# Samples are sent at most once per tick (in seconds)
+	TICK = 1
+
+	def __init__(self, generator):
+		self.generator = generator
+
+		# All subscribed keys by client
+		self.subscriptions = {}
+
+		# Watches for disconnecting clients
+		self._watches = {}
+
+		# All keys that are subscribed by any client
+		self._keys = set()
+
+		# Samples that will be sent with the next tick
+		self._pending = {}
+
+		self._timeout = None
+
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def make_key(object):
+		return "%s/%s" % (object.plugin.name, object.id)
+
+	def subscribe(self, sender, keys):
+		with self._lock:
+			self.subscriptions.setdefault(sender, set()).update(keys)
+			self._update()
+
+		# Forget about clients when they disconnect
+		if not sender in self._watches:
+			self._watches[sender] = self.generator.connection.watch_name_owner(
+				sender, lambda owner: self._name_owner_changed(sender, owner))
+
+		# Start sending samples
+		if self._timeout is None:
+			self._timeout = gi.repository.GLib.timeout_add_seconds(self.TICK, self.flush)
+
+	def unsubscribe(self, sender, keys=None):
+		with self._lock:
+			subscriptions = self.subscriptions.get(sender, set())
+
+			if keys is None:
+				subscriptions.clear()
+			else:
+				subscriptions.difference_update(keys)
+
+			# Remove the client if it has unsubscribed from everything
+			if not subscriptions:
+				self.subscriptions.pop(sender, None)
+
+				watch = self._watches.pop(sender, None)
+				if watch:
+					watch.cancel()
+
+			self._update()
+
+	def _name_owner_changed(self, sender, owner):
+		# The client has gone away
+		if not owner:
+			self.unsubscribe(sender)
+
+	def _update(self):
+		self._keys = set()
+
+		for keys in self.subscriptions.values():
+			self._keys.update(keys)
+
+	def publish(self, object, data):
+		# Skip if nobody is interested in this object
+		if not self._keys:
+			return
+
+		key = self.make_key(object)
+
+		if not key in self._keys and not "%s/*" % object.plugin.name in self._keys \
+				and not "*" in self._keys:
+			return
+
+		dataset = object.make_dataset(data)
+
+		# Unknown values are sent as NaN
+		dataset = {
+			name : math.nan if value is None else value for name, value in dataset.items()
+		}
+
+		with self._lock:
+			self._pending[key] = dataset
+
+	def flush(self):
+		"""
+			Called once per tick to send all pending samples
+		"""
+		with self._lock:
+			samples, self._pending = self._pending, {}
+
+			# Stop the timer when there are no subscribers left
+			if not self.subscriptions:
+				self._timeout = None
+				return False
+
+		if samples:
+			self.generator.Samples(time.time(), samples)
+
+		return True
+
 
 class GraphGenerator(dbus.service.Object):
 	def __init__(self, collecty):
@@ -78,9 +208,105 @@ class GraphGenerator(dbus.service.Object):
 
 		self.collecty = collecty
 
-	@dbus.service.method(DOMAIN, in_signature="s")
-	def Backup(self, filename):
-		self.collecty.backup(filename)
+	def _message_cb(self, connection, message):
+		"""
+			Dispatches all incoming method calls and
+			records how long each method took
+		"""
+		member = message.get_member()
+
+		# Don't let callers create a key for any name they send
+		method = getattr(self.__class__, member or "", None)
+		if not getattr(method, "_dbus_is_method", False):
+			member = "other"
+
+		with self.collecty.stats.timer("bus/%s" % member):
+			return dbus.service.Object._message_cb(self, connection, message)
+
+	@dbus.service.method(DOMAIN, in_signature="s",
+		async_callbacks=("reply_handler", "error_handler"))
+	def Backup(self, filename, reply_handler, error_handler):
+		"""
+			Writes a backup and returns when it has finished
+		"""
+		job = self.collecty.backup(filename)
+
+		self._reply_when_finished(job, reply_handler, error_handler)
+
+	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="s")
+	def StartBackup(self, filename, kwargs):
+		"""
+			Starts writing a backup in the background and
+			returns the ID of the job
+		"""
+		job = self.collecty.backup(filename, **kwargs)
+
+		return job.id
+
+	@dbus.service.method(DOMAIN, in_signature="s",
+		async_callbacks=("reply_handler", "error_handler"))
+	def Restore(self, filename, reply_handler, error_handler):
+		"""
+			Restores a backup and returns when it has finished
+		"""
+		job = self.collecty.restore(filename)
+
+		self._reply_when_finished(job, reply_handler, error_handler)
+
+	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="s")
+	def StartRestore(self, filename, kwargs):
+		"""
+			Starts restoring a backup in the background and
+			returns the ID of the job
+		"""
+		job = self.collecty.restore(filename, **kwargs)
+
+		return job.id
+
+	@dbus.service.method(DOMAIN, in_signature="a{sv}", out_signature="s")
+	def Profile(self, kwargs):
+		"""
+			Starts profiling the daemon and returns the name
+			of the file the profile will be written to
+		"""
+		# Callers cannot choose the file which is written
+		kwargs = { k : kwargs[k] for k in ("mode", "collections", "renders") if k in kwargs }
+
+		return self.collecty.profile(**kwargs)
+
+	@dbus.service.method(DOMAIN)
+	def Reload(self):
+		"""
+			Reloads the configuration of the daemon
+		"""
+		self.collecty.request_reload()
+
+	@dbus.service.method(DOMAIN, in_signature="s", out_signature="a{sv}")
+	def JobStatus(self, id):
+		"""
+			Returns the state and progress of a background job
+		"""
+		job = self.collecty.get_job(id)
+
+		return job.status()
+
+	def _reply_when_finished(self, job, reply_handler, error_handler):
+		"""
+			Sends the reply of an asynchronous call when job has finished
+		"""
+		def finished(job):
+			if job.state == "failed":
+				error_handler(dbus.exceptions.DBusException(job.error))
+			else:
+				reply_handler()
+
+			# Only run once
+			return False
+
+		# Reply from the main loop
+		job.add_callback(
+			lambda job: gi.repository.GLib.idle_add(finished, job),
+		)
 
 	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="a{sv}")
 	def GenerateGraph(self, template_name, kwargs):
@@ -95,6 +321,52 @@ class GraphGenerator(dbus.service.Object):
 
 		return graph
 
+	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="a{sv}h")
+	def GenerateGraphFd(self, template_name, kwargs):
+		"""
+			Like GenerateGraph, but the image is passed to the client
+			as a file descriptor instead of being copied into the message.
+		"""
+		graph = self.collecty.generate_graph(template_name, **kwargs)
+
+		# Write the image into an anonymous file
+		fd = util.make_memfd(graph.pop("image", None) or b"")
+
+		# UnixFd holds its own duplicate of the file descriptor
+		try:
+			return graph, dbus.types.UnixFd(fd)
+		finally:
+			os.close(fd)
+
+	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="a{sa{sa{sd}}}")
+	def Analyse(self, template_name, kwargs):
+		"""
+			Returns statistics for all data sources of all
+			(or the selected) objects of the given template.
+		"""
+		return self.collecty.analyse(template_name, **kwargs)
+
+	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="a{sv}")
+	def FetchSeries(self, template_name, kwargs):
+		"""
+			Returns the raw data of the object used by the given template.
+
+			Each series is sent as an array of little-endian doubles.
+		"""
+		series = self.collecty.fetch_series(template_name, **kwargs)
+
+		series["names"] = dbus.Array(series["names"], signature="s")
+
+		for key in ("series", "timestamps", "minimum", "maximum"):
+			if not key in series:
+				continue
+
+			series[key] = dbus.Dictionary({
+				name : dbus.ByteArray(values) for name, values in series[key].items()
+			}, signature="say")
+
+		return series
+
 	@dbus.service.method(DOMAIN, in_signature="", out_signature="a{sv}")
 	def GraphInfo(self, template_name, kwargs):
 		"""
@@ -115,6 +387,47 @@ class GraphGenerator(dbus.service.Object):
 
 		return last_update
 
+	@dbus.service.method(DOMAIN, in_signature="sa{sv}", out_signature="a{sv}")
+	def LiveSeries(self, template_name, kwargs):
+		"""
+			Returns the most recent samples of the object
+			used by the given template from memory.
+		"""
+		series = self.collecty.live_series(template_name, **kwargs)
+
+		series["names"] = dbus.Array(series["names"], signature="s")
+		series["timestamps"] = dbus.ByteArray(series["timestamps"])
+		series["series"] = dbus.Dictionary({
+			name : dbus.ByteArray(values) for name, values in series["series"].items()
+		}, signature="say")
+
+		return series
+
+	@dbus.service.method(DOMAIN, in_signature="as", sender_keyword="sender")
+	def Subscribe(self, keys, sender=None):
+		"""
+			Subscribes to live samples of the given objects.
+
+			Keys have the format "plugin/object", "plugin/*" or "*".
+		"""
+		self.publisher.subscribe(sender, ["%s" % key for key in keys])
+
+	@dbus.service.method(DOMAIN, in_signature="as", sender_keyword="sender")
+	def Unsubscribe(self, keys, sender=None):
+		"""
+			Unsubscribes from the given objects or from
+			everything if no keys are given.
+		"""
+		self.publisher.unsubscribe(sender, ["%s" % key for key in keys] or None)
+
+	@dbus.service.signal(DOMAIN, signature="da{sa{sd}}")
+	def Samples(self, timestamp, samples):
+		"""
+			Sent once per tick with the latest sample of
+			each subscribed object that has been collected.
+		"""
+		pass
+
 	@dbus.service.method(DOMAIN, in_signature="", out_signature="as")
 	def ListTemplates(self):
 		"""
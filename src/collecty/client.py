@@ -25,8 +25,10 @@ import dbus
 import os
 import platform
 import sys
+import time
 
 from . import bus
+from . import util
 from .i18n import _
 
 class Collecty(object):
@@ -35,11 +37,59 @@ class Collecty(object):
 
 		self.proxy = self.bus.get_object(bus.DOMAIN, "/GraphGenerator")
 
-	def backup(self, filename):
+	def backup(self, filename, progress=None, **kwargs):
 		"""
 			Writes a backup of everything to file given filehandle
+
+			progress is called with the status of the backup job
+			while it is running.
+		"""
+		id = self.proxy.StartBackup(filename, kwargs)
+
+		return self.wait_for_job(id, progress=progress)
+
+	def restore(self, filename, progress=None, **kwargs):
+		"""
+			Restores all databases from the given backup
+		"""
+		id = self.proxy.StartRestore(filename, kwargs)
+
+		return self.wait_for_job(id, progress=progress)
+
+	def profile(self, **kwargs):
+		"""
+			Starts profiling the daemon and returns the name
+			of the file the profile will be written to
+		"""
+		return self.proxy.Profile(kwargs)
+
+	def reload(self):
+		"""
+			Makes the daemon reload its configuration
 		"""
-		self.proxy.Backup(filename)
+		self.proxy.Reload()
+
+	def job_status(self, id):
+		return self.proxy.JobStatus(id)
+
+	def wait_for_job(self, id, progress=None, interval=1):
+		"""
+			Waits until the background job has finished and
+			raises an error if it failed
+		"""
+		while True:
+			status = self.job_status(id)
+
+			if progress:
+				progress(status)
+
+			if status["state"] == "failed":
+				raise RuntimeError(status.get("error"))
+
+			elif status["state"] == "finished":
+				return status
+
+			time.sleep(interval)
 
 	def last_update(self, template_name, **kwargs):
 		last_update = self.proxy.LastUpdate(template_name, kwargs)
@@ -61,15 +111,104 @@ class Collecty(object):
 		return dict(graph_info)
 
 	def generate_graph(self, template_name, **kwargs):
-		graph = self.proxy.GenerateGraph(template_name, kwargs,
+		graph, fd = self.proxy.GenerateGraphFd(template_name, kwargs,
 			signature="sa{sv}")
 
-		# Convert the byte array into a byte string again
-		if graph:
-			graph["image"] = bytes(graph["image"])
+		# Read the image straight from the passed file descriptor
+		with os.fdopen(fd.take(), "rb") as f:
+			graph["image"] = f.read()
 
 		return graph
 
+	def analyse(self, template_name, **kwargs):
+		"""
+			Returns statistics (mean, stddev, min, max, percentiles
+			and rate) of all objects of the given template
+		"""
+		stats = self.proxy.Analyse(template_name, kwargs,
+			signature="sa{sv}")
+
+		return {
+			"%s" % object_id : {
+				"%s" % name : { "%s" % k : float(v) for k, v in values.items() }
+					for name, values in data_sources.items()
+			} for object_id, data_sources in stats.items()
+		}
+
+	def fetch_series(self, template_name, **kwargs):
+		"""
+			Returns the raw data of the object used by the given template
+		"""
+		series = self.proxy.FetchSeries(template_name, kwargs,
+			signature="sa{sv}")
+
+		ret = {
+			"start"  : int(series["start"]),
+			"end"    : int(series["end"]),
+			"step"   : int(series["step"]),
+			"names"  : ["%s" % name for name in series["names"]],
+		}
+
+		# Unpack all series
+		for key in ("series", "timestamps", "minimum", "maximum"):
+			if not key in series:
+				continue
+
+			ret[key] = {
+				"%s" % name : util.unpack_values(bytes(values))
+					for name, values in series[key].items()
+			}
+
+		return ret
+
+	def live_series(self, template_name, **kwargs):
+		"""
+			Returns the most recent samples of the object
+			used by the given template
+		"""
+		series = self.proxy.LiveSeries(template_name, kwargs,
+			signature="sa{sv}")
+
+		return {
+			"names"      : ["%s" % name for name in series["names"]],
+			"timestamps" : util.unpack_values(bytes(series["timestamps"])),
+			"series"     : {
+				"%s" % name : util.unpack_values(bytes(values))
+					for name, values in series["series"].items()
+			},
+		}
+
+	def subscribe(self, keys, callback):
+		"""
+			Calls callback(timestamp, samples) whenever new samples
+			of the given objects ("plugin/object") have been collected.
+
+			This requires a running main loop.
+		"""
+		match = self.bus.add_signal_receiver(
+			lambda timestamp, samples: callback(
+				datetime.datetime.utcfromtimestamp(timestamp),
+				{
+					"%s" % key : { "%s" % k : float(v) for k, v in dataset.items() }
+						for key, dataset in samples.items()
+				},
+			),
+			signal_name="Samples", dbus_interface=bus.DOMAIN,
+		)
+
+		self.proxy.Subscribe(keys, signature="as")
+
+		return match
+
+	def unsubscribe(self, match=None, keys=None):
+		"""
+			Unsubscribes from the given objects or from everything
+		"""
+		if match:
+			match.remove()
+
+		self.proxy.Unsubscribe(keys or [], signature="as")
+
 	def version(self):
 		"""
 			Returns the version of the daemon
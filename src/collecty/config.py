@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import configparser
+import logging
+
+from .i18n import _
+
+log = logging.getLogger("collecty.config")
+
+# The section with all settings of the daemon itself
+DAEMON = "daemon"
+
+# Options which must be positive integers
+POSITIVE_INTEGERS = ("commit-interval", "interval")
+
+# Options which must be zero or positive numbers
+NON_NEGATIVE_FLOATS = ("budget", "cpu-budget", "max-load", "timeout")
+
+class Configuration(object):
+	"""
+		Reads the configuration file
+
+		The [daemon] section configures the daemon itself and every
+		other section configures the plugin with the same name.
+		Settings in [DEFAULT] apply to all sections.
+	"""
+	def __init__(self, filename=None):
+		self.filename = filename
+
+		self.parser = configparser.ConfigParser(
+			interpolation=None,
+			converters={ "list" : str.split },
+		)
+
+		if self.filename:
+			self.read(self.filename)
+
+	def read(self, filename):
+		log.debug(_("Reading configuration from %s") % filename)
+
+		# A missing file is fine, everything will be at its default
+		try:
+			with open(filename) as f:
+				self.parser.read_file(f)
+		except FileNotFoundError:
+			log.debug(_("Configuration file %s does not exist") % filename)
+
+		self._validate()
+
+	def _validate(self):
+		"""
+			Checks all values so that the configuration is rejected
+			before anything is applied
+		"""
+		for name in [configparser.DEFAULTSECT] + self.parser.sections():
+			section = self.parser[name]
+
+			for option in POSITIVE_INTEGERS:
+				if not option in section:
+					continue
+
+				if section.getint(option) <= 0:
+					raise ValueError(_("%s must be positive in [%s]") % (option, name))
+
+			for option in NON_NEGATIVE_FLOATS:
+				if not option in section:
+					continue
+
+				if section.getfloat(option) < 0:
+					raise ValueError(_("%s must not be negative in [%s]") % (option, name))
+
+			# These will raise ValueError if they are invalid
+			section.getint("priority", fallback=None)
+			section.getboolean("enabled", fallback=None)
+
+	def get(self, name):
+		"""
+			Returns the section with the given name (which
+			is empty if it does not exist)
+		"""
+		try:
+			return self.parser[name]
+		except KeyError:
+			return self.parser[configparser.DEFAULTSECT]
+
+	@property
+	def daemon(self):
+		return self.get(DAEMON)
+
+	@property
+	def commit_interval(self):
+		return self.daemon.getint("commit-interval", fallback=None)
+
+	@property
+	def max_load(self):
+		return self.daemon.getfloat("max-load", fallback=None)
+
+	@property
+	def skip_interfaces(self):
+		return self.daemon.getlist("skip-interfaces", fallback=None)
+
+	def is_enabled(self, plugin):
+		"""
+			Returns True if the plugin with the given name is enabled
+		"""
+		return self.get(plugin).getboolean("enabled", fallback=True)
@@ -23,6 +23,8 @@ from .__version__ import *
 
 DATABASE_DIR = "/var/lib/collecty"
 
+CONFIG_FILE = "/etc/collecty/collecty.conf"
+
 DEFAULT_IMAGE_FORMAT = "SVG"
 SUPPORTED_IMAGE_FORMATS = ("SVG", "PNG", "PDF")
 
@@ -19,31 +19,90 @@
 #                                                                             #
 ###############################################################################
 
+import collections
+import configparser
+import datetime
 import logging
 import os
+import queue
 import rrdtool
 import sched
+import select
 import signal
-import tarfile
 import tempfile
 import threading
 import time
 
+from . import backup
 from . import bus
+from . import config
+from . import httpd
+from . import jobs
+from . import live
 from . import plugins
+from . import profiler
+from . import recording
+from . import stats
+from . import util
 
 from .constants import *
 from .i18n import _
 
 log = logging.getLogger("collecty")
 
+# How long (in seconds) the load of the system is remembered
+LOAD_INTERVAL = 5
+
+# The number of locks that are shared by all databases
+FILE_LOCKS = 64
+
 class Daemon(object):
 	# The default interval, when all data is written to disk.
 	COMMIT_INTERVAL = 300
 
-	def __init__(self, debug=False):
+	# Graphs which are rendered in advance after each commit
+	# (template, object, interval) - no object renders the graph for all objects
+	PRERENDER_GRAPHS = [
+		("processor",      "default", "hour"),
+		("memory",         "default", "hour"),
+		("interface-bits", None,      "hour"),
+		("latency",        None,      "hour"),
+		("processor",      "default", "day"),
+		("memory",         "default", "day"),
+		("interface-bits", None,      "day"),
+		("latency",        None,      "day"),
+	]
+
+	# The number of most frequently requested graphs that are pre-rendered, too
+	PRERENDER_POPULAR = 10
+
+	# The number of finished background jobs that are remembered
+	MAX_FINISHED_JOBS = 10
+
+	# The number of collections that are profiled by default
+	PROFILE_COLLECTIONS = 20
+
+	def __init__(self, debug=False, listen=None, root=None, database_dir=None, with_bus=True,
+			record=None, commit_interval=None, config_file=None):
 		self.debug = debug
 
+		# Read the configuration
+		self.config = config.Configuration(config_file)
+		self.config_file = config_file
+
+		# Where all databases are stored
+		self.database_dir = database_dir or DATABASE_DIR
+
+		# Read procfs and sysfs from somewhere else
+		if root:
+			util.set_root(root)
+
+		# Record everything that plugins read
+		self.recorder = None
+		if record:
+			self.recorder = recording.Recorder(record)
+			util.set_reader(self.recorder)
+
 		# Reset timezone to UTC
 		# rrdtool is reading that from the environment
 		os.environ["TZ"] = "UTC"
@@ -54,39 +113,125 @@ class Daemon(object):
 
 		self.plugins = []
 
+		# An index of all templates and the plugins they belong to
+		self._templates = {}
+
+		# How often the write queue is written to disk
+		self._commit_interval = commit_interval
+		self.commit_interval = self._get_commit_interval()
+
+		# Which network interfaces should not be collected
+		util.set_skip_interfaces(self.config.skip_interfaces)
+
 		# Create the scheduler
-		self.scheduler = sched.scheduler()
+		self.scheduler = sched.scheduler(time.monotonic, self._sleep)
+
+		# The next scheduled events of each plugin
+		self._events = {}
+		self._live_events = {}
+
+		# A pipe that wakes up the scheduler (which is
+		# safe to use from signal handlers and other threads)
+		self._wakeup, self._wakeup_writer = os.pipe()
+		for fd in (self._wakeup, self._wakeup_writer):
+			os.set_blocking(fd, False)
+
+		# Functions that should run in the main thread as soon as possible
+		self._pending = collections.deque()
+
+		# When the load was read last and its value
+		self._load = None
+
+		self._commit_event = None
 		self._schedule_commit()
 
+		# Measurements of the daemon itself
+		self.stats = stats.Statistics()
+
 		# The write queue holds all collected pieces of data which
 		# will be written to disk later.
 		self.write_queue = WriteQueue(self)
 
+		# Holds live samples in memory
+		self.live = live.LiveStore(self)
+
+		# Keeps rendered graphs until the next commit
+		self.graph_cache = GraphCache()
+
+		# Renders graphs in the background
+		self.prerenderer = Prerenderer(self)
+
+		# Background jobs
+		self._jobs = {}
+		self._jobs_lock = threading.Lock()
+
+		# A running profiler
+		self.profiler = None
+		self._profiler_lock = threading.Lock()
+
 		# Create a thread that connects to dbus and processes requests we
 		# get from there.
-		self.bus = bus.Bus(self)
+		self.bus = None
+		if with_bus:
+			self.bus = bus.Bus(self)
+
+		# Optionally serve metrics over HTTP
+		self.httpd = None
+		if listen:
+			self.httpd = httpd.HTTPServer(self, listen)
 
 		log.debug(_("Collecty successfully initialized"))
 
-	def add_plugin(self, plugin_class):
+	def add_plugin(self, plugin_class, **kwargs):
 		# Try initialising a new plugin. If that fails, we will log the
 		# error and try to go on.
 		try:
-			plugin = plugin_class(self)
+			plugin = plugin_class(self, **kwargs)
 		except:
 			log.critical(_("Plugin %s could not be initialised") % plugin_class, exc_info=True)
 			return
 
+		# Apply the configuration
+		plugin.configure(self.config.get(plugin.name))
+
 		self.plugins.append(plugin)
 
+		# Index all templates of this plugin
+		for template in plugin.templates:
+			self._templates[template.name] = (plugin, template)
+
 		# Collect immediately
 		self._schedule_plugin(plugin, interval=0)
 
+		# Start collecting live samples
+		if plugin.live_interval:
+			self._schedule_live(plugin, interval=0)
+
+		return plugin
+
+	def remove_plugin(self, plugin):
+		"""
+			Stops collecting data with the given plugin
+		"""
+		log.debug("Removing plugin %s" % plugin)
+
+		for events in (self._events, self._live_events):
+			event = events.pop(plugin, None)
+
+			if event:
+				self._cancel(event)
+
+		self.plugins.remove(plugin)
+
+		for template in plugin.templates:
+			self._templates.pop(template.name, None)
+
+		# Drop all live samples
+		self.live.forget(o.file for o in plugin.get_objects())
+
 	@property
 	def templates(self):
-		for plugin in self.plugins:
-			for template in plugin.templates:
-				yield template
+		return [template for plugin, template in self._templates.values()]
 
 	def _schedule_plugin(self, plugin, interval=None):
 		"""
@@ -94,28 +239,95 @@ class Daemon(object):
 		"""
 		log.debug("Scheduling plugin %s for executing in %ss" % (plugin, plugin.interval))
 
-		self.scheduler.enter(
-			plugin.interval if interval is None else interval, plugin.priority, self._collect, (plugin,),
+		if interval is None:
+			interval = plugin.interval
+
+		self._events[plugin] = self.scheduler.enter(
+			interval, plugin.priority, self._collect, (plugin,),
+			{ "due" : self.scheduler.timefunc() + interval },
+		)
+
+	def _schedule_live(self, plugin, interval=None):
+		"""
+			Schedules a live collection event for the given plugin
+		"""
+		self._live_events[plugin] = self.scheduler.enter(
+			plugin.live_interval if interval is None else interval,
+			plugin.priority, self._collect_live, (plugin,),
 		)
 
 	def _schedule_commit(self):
-		log.debug("Scheduling commit in %ss" % self.COMMIT_INTERVAL)
+		log.debug("Scheduling commit in %ss" % self.commit_interval)
 
-		self.scheduler.enter(
-			self.COMMIT_INTERVAL, -1, self._commit,
+		self._commit_event = self.scheduler.enter(
+			self.commit_interval, -1, self._commit,
 		)
 
-	def _collect(self, plugin, **kwargs):
+	def _cancel(self, event):
+		try:
+			self.scheduler.cancel(event)
+
+		# The event has already run
+		except ValueError:
+			pass
+
+	def _sleep(self, delay):
+		"""
+			Waits until the next event is due or until the scheduler is woken up
+		"""
+		r, w, x = select.select([self._wakeup], [], [], delay)
+
+		# Empty the pipe
+		if r:
+			try:
+				while os.read(self._wakeup, 1024):
+					pass
+			except BlockingIOError:
+				pass
+
+		# Run anything that has been requested before anything else
+		while self._pending:
+			self.scheduler.enter(0, -2, self._pending.popleft())
+
+	def _collect(self, plugin, due=None, **kwargs):
 		"""
 			Called for each plugin when it is time to collect some data
 		"""
 		log.debug("Collection started for %s" % plugin)
 
+		# Measure how late this collection has started
+		if due is not None:
+			self.stats.record("lateness", self.scheduler.timefunc() - due)
+
 		# Add the next collection event to the scheduler
 		self._schedule_plugin(plugin)
 
+		# Skip this collection while the plugin is backing off
+		if plugin.should_skip(overloaded=self.is_overloaded()):
+			log.debug("Skipping collection for %s" % plugin)
+
+			plugin.skip()
+			return
+
 		# Run collection
-		plugin.collect()
+		if self.recorder:
+			with self.recorder.frame(plugin):
+				self._run_profiled("collect", plugin.collect)
+		else:
+			self._run_profiled("collect", plugin.collect)
+
+	def _collect_live(self, plugin):
+		"""
+			Called for each plugin when it is time to collect live data
+		"""
+		# Add the next live collection event to the scheduler
+		self._schedule_live(plugin)
+
+		# Don't collect live data while the plugin is backing off
+		if plugin.backoff > 1:
+			return
+
+		plugin.collect_live()
 
 	def _commit(self):
 		"""
@@ -127,16 +339,62 @@ class Daemon(object):
 		# Write everything in the queue
 		self.write_queue.commit()
 
+		# All cached graphs are outdated now
+		self.graph_cache.invalidate()
+
+		# Forget about graphs that are no longer being requested
+		self.graph_cache.decay()
+
+		# Render the most important graphs again
+		for template_name, kwargs in self._prerender_requests():
+			self.prerenderer.submit(template_name, kwargs)
+
+	def _prerender_requests(self):
+		"""
+			Returns all graphs which should be available
+			from the cache straight away
+		"""
+		# The most popular graphs come first
+		requests = self.graph_cache.popular(self.PRERENDER_POPULAR)
+
+		for template_name, object_id, interval in self.PRERENDER_GRAPHS:
+			plugin = self.get_plugin_from_template(template_name)
+			if not plugin:
+				continue
+
+			if object_id is None:
+				object_ids = [o.id for o in plugin.get_objects()]
+			else:
+				object_ids = [object_id]
+
+			for object_id in object_ids:
+				requests.append((template_name, {
+					"object_id" : object_id,
+					"interval"  : interval,
+				}))
+
+		# Leave room in the cache for graphs that are rendered on demand
+		return requests[:GraphCache.MAX_GRAPHS // 2]
+
 	def run(self):
 		# Register signal handlers.
 		self.register_signal_handler()
 
 		# Start the bus
-		self.bus.start()
+		if self.bus:
+			self.bus.start()
+
+		# Start the HTTP server
+		if self.httpd:
+			self.httpd.start()
 
-		# Add all plugins
+		# Start rendering graphs in the background
+		self.prerenderer.start()
+
+		# Add all enabled plugins
 		for plugin in plugins.get():
-			self.add_plugin(plugin)
+			if self.config.is_enabled(plugin.name):
+				self.add_plugin(plugin)
 
 		# Run the scheduler
 		try:
@@ -146,48 +404,219 @@ class Daemon(object):
 
 		# Clear all plugins
 		self.plugins.clear()
+		self._templates.clear()
 
 		# Stop the bus thread
-		self.bus.shutdown()
+		if self.bus:
+			self.bus.shutdown()
+
+		# Stop the HTTP server
+		if self.httpd:
+			self.httpd.shutdown()
+
+		# Stop rendering graphs
+		self.prerenderer.shutdown()
 
 		# Write all collected data to disk before ending the main thread
 		self.write_queue.commit()
 
+		# Close the recording
+		if self.recorder:
+			util.set_reader(None)
+			self.recorder.close()
+
 		log.debug(_("Main thread exited"))
 
 	def shutdown(self):
 		log.info(_("Received shutdown signal"))
 
+		# Cancel all scheduled events which ends the main loop
+		for event in self.scheduler.queue:
+			self._cancel(event)
+
+		self._wake()
+
+	def request(self, func):
+		"""
+			Runs func in the main thread as soon as possible
+
+			This can be called from signal handlers and other threads.
+		"""
+		self._pending.append(func)
+		self._wake()
+
+	def request_reload(self):
+		self.request(self.reload)
+
+	def _wake(self):
+		try:
+			os.write(self._wakeup_writer, b"\0")
+
+		# The pipe is full, so the scheduler will wake up anyway
+		except BlockingIOError:
+			pass
+
+	def reload(self):
+		"""
+			Reads the configuration file again and applies it
+		"""
+		log.info(_("Reloading configuration"))
+
+		try:
+			self.config = config.Configuration(self.config_file)
+
+		# Keep running with the old configuration
+		except (OSError, ValueError, configparser.Error) as e:
+			log.error(_("Could not reload the configuration: %s") % e)
+			return
+
+		# Reschedule the next commit if the interval has changed
+		commit_interval = self._get_commit_interval()
+
+		if not commit_interval == self.commit_interval:
+			self.commit_interval = commit_interval
+
+			if self._commit_event:
+				self._cancel(self._commit_event)
+
+			self._schedule_commit()
+
+		util.set_skip_interfaces(self.config.skip_interfaces)
+
+		running = { p.name : p for p in self.plugins }
+
+		for plugin_class in plugins.get():
+			plugin = running.get(plugin_class.name)
+
+			# Stop plugins that have been disabled
+			if not self.config.is_enabled(plugin_class.name):
+				if plugin:
+					log.info(_("Disabling plugin %s") % plugin.name)
+					self.remove_plugin(plugin)
+
+				continue
+
+			# Start plugins that have been enabled
+			if not plugin:
+				log.info(_("Enabling plugin %s") % plugin_class.name)
+				self.add_plugin(plugin_class)
+				continue
+
+			interval, priority = plugin.interval, plugin.priority
+			live_interval = plugin.live_interval
+
+			plugin.configure(self.config.get(plugin.name))
+
+			# Start, stop or reschedule collecting live samples
+			if not live_interval == plugin.live_interval:
+				event = self._live_events.pop(plugin, None)
+				if event:
+					self._cancel(event)
+
+				if plugin.live_interval:
+					self._schedule_live(plugin, interval=0)
+				else:
+					self.live.forget(o.file for o in plugin.get_objects())
+
+			# Reschedule the plugin if it should run at a different time
+			if not (interval, priority) == (plugin.interval, plugin.priority):
+				log.info(_("Rescheduling plugin %s to run every %ss") \
+					% (plugin.name, plugin.interval))
+
+				event = self._events.pop(plugin, None)
+				if event:
+					self._cancel(event)
+
+				self._schedule_plugin(plugin)
+
+	def is_overloaded(self):
+		"""
+			Returns True if the load of the system is above the threshold
+		"""
+		max_load = self.config.max_load
+		if not max_load:
+			return False
+
+		now = time.monotonic()
+
+		# The kernel only updates the load every few seconds,
+		# so don't read it again for every plugin on every tick
+		if self._load is None or now - self._load[0] >= LOAD_INTERVAL:
+			try:
+				with util.open_file("/proc/loadavg") as f:
+					load = float(f.read().split()[0])
+			except (OSError, IndexError, ValueError):
+				load = None
+
+			self._load = (now, load)
+
+		now, load = self._load
+
+		if load is None:
+			return False
+
+		return load / (os.cpu_count() or 1) > max_load
+
+	def _get_commit_interval(self):
+		return self._commit_interval or self.config.commit_interval \
+			or self.COMMIT_INTERVAL
+
 	def register_signal_handler(self):
-		for s in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+		for s in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1, signal.SIGUSR2):
 			log.debug(_("Registering signal %d") % s)
 
-		signal.signal(s, self.signal_handler)
+			signal.signal(s, self.signal_handler)
 
 	def signal_handler(self, sig, *args, **kwargs):
 		log.info(_("Caught signal %d") % sig)
 
 		if sig in (signal.SIGTERM, signal.SIGINT):
-			# Shutdown this application.
-			self.shutdown()
+			# Shutdown this application (which writes all data to disk)
+			self.request(self.shutdown)
+
+		elif sig == signal.SIGHUP:
+			# Reload the configuration
+			self.request_reload()
 
 		elif sig == signal.SIGUSR1:
-			# Commit all data.
-			self.write_queue.commit()
+			# Commit all data (but not while this might
+			# have interrupted a commit that is running)
+			self.request(self.write_queue.commit)
+
+		elif sig == signal.SIGUSR2:
+			# Start or stop profiling
+			self.request(self.toggle_profiler)
 
 	def get_plugin_from_template(self, template_name):
-		for plugin in self.plugins:
-			if not template_name in [t.name for t in plugin.templates]:
-				continue
+		try:
+			plugin, template = self._templates[template_name]
+		except KeyError:
+			return
 
-			return plugin
+		return plugin
 
 	def generate_graph(self, template_name, *args, **kwargs):
 		plugin = self.get_plugin_from_template(template_name)
 		if not plugin:
 			raise RuntimeError("Could not find template %s" % template_name)
 
-		return plugin.generate_graph(template_name, *args, **kwargs)
+		# Count this request so that popular graphs can be pre-rendered
+		self.graph_cache.hit(template_name, kwargs)
+
+		# Serve the graph from the cache if possible
+		graph = self.graph_cache.get(template_name, kwargs)
+		if graph:
+			return graph
+
+		generation = self.graph_cache.generation(template_name)
+
+		graph = self._run_profiled("render",
+			plugin.generate_graph, template_name, *args, **kwargs)
+
+		# Store the graph for the next request
+		self.graph_cache.put(template_name, kwargs, graph, generation=generation)
+
+		return graph
 
 	def graph_info(self, template_name, *args, **kwargs):
 		plugin = self.get_plugin_from_template(template_name)
@@ -203,34 +632,379 @@ class Daemon(object):
 
 		return plugin.last_update(*args, **kwargs)
 
-	def backup(self, filename):
-		# Write all data to disk first
-		self.write_queue.commit()
+	def fetch_series(self, template_name, *args, **kwargs):
+		plugin = self.get_plugin_from_template(template_name)
+		if not plugin:
+			raise RuntimeError("Could not find template %s" % template_name)
+
+		return plugin.fetch_series(*args, **kwargs)
+
+	def live_series(self, template_name, *args, **kwargs):
+		plugin = self.get_plugin_from_template(template_name)
+		if not plugin:
+			raise RuntimeError("Could not find template %s" % template_name)
+
+		return plugin.live_series(*args, **kwargs)
+
+	def analyse(self, template_name, *args, **kwargs):
+		plugin = self.get_plugin_from_template(template_name)
+		if not plugin:
+			raise RuntimeError("Could not find template %s" % template_name)
+
+		return plugin.analyse(*args, **kwargs)
+
+	def profile(self, mode="cpu", collections=None, renders=0, **kwargs):
+		"""
+			Starts profiling the given number of collections and renders
+
+			Returns the name of the file the result will be written to.
+		"""
+		if collections is None:
+			collections = 0 if renders else self.PROFILE_COLLECTIONS
+
+		with self._profiler_lock:
+			if self.profiler:
+				raise RuntimeError("The profiler is already running")
+
+			# Create a new file that nobody else can have prepared
+			fd, filename = tempfile.mkstemp(prefix="collecty-%s-%s-" \
+				% (mode, time.strftime("%Y%m%d-%H%M%S")), suffix=".prof")
+			os.close(fd)
+
+			try:
+				self.profiler = profiler.Profiler(filename, mode=mode, collections=collections,
+					renders=renders, callback=self._profiler_finished, **kwargs)
+				self.profiler.start()
+
+			# Don't leave an empty file behind
+			except:
+				self.profiler = None
+				os.unlink(filename)
+
+				raise
+
+		return filename
+
+	def toggle_profiler(self):
+		"""
+			Starts the profiler or stops it if it is running
+		"""
+		p = self.profiler
+
+		if p:
+			p.stop()
+		else:
+			self.profile()
+
+	def _profiler_finished(self, p):
+		with self._profiler_lock:
+			if self.profiler is p:
+				self.profiler = None
+
+	def _run_profiled(self, kind, func, *args, **kwargs):
+		"""
+			Calls func and passes it to the profiler if it is running
+		"""
+		p = self.profiler
+
+		if p:
+			return p.run(kind, func, *args, **kwargs)
+
+		return func(*args, **kwargs)
+
+	def start_job(self, name, func, *args, **kwargs):
+		"""
+			Runs func in the background and returns the job
+		"""
+		job = jobs.Job(name, func, *args, **kwargs)
+
+		with self._jobs_lock:
+			# Forget about the oldest finished jobs
+			finished = [j for j in self._jobs.values() if j.finished]
+			for j in finished[:-self.MAX_FINISHED_JOBS]:
+				del self._jobs[j.id]
+
+			self._jobs[job.id] = job
+
+		job.start()
+
+		return job
+
+	def get_job(self, id):
+		with self._jobs_lock:
+			try:
+				return self._jobs[id]
+			except KeyError:
+				raise RuntimeError("Could not find job %s" % id)
+
+	def backup(self, filename, **kwargs):
+		"""
+			Starts writing a backup of all databases to filename
+			in the background and returns the job
+		"""
+		b = backup.Backup(self, filename, **kwargs)
+
+		return self.start_job("backup", b)
+
+	def restore(self, filename, **kwargs):
+		"""
+			Starts restoring all databases from filename
+			in the background and returns the job
+		"""
+		r = backup.Restore(self, filename, **kwargs)
+
+		return self.start_job("restore", r)
+
+
+class GraphCache(object):
+	"""
+		Holds rendered graphs until new data has been committed and
+		keeps track of which graphs are requested most often.
+	"""
+	# The number of graphs that are kept
+	MAX_GRAPHS = 100
+
+	# The number of different requests that are being counted
+	MAX_REQUESTS = 100
+
+	def __init__(self):
+		self.log = logging.getLogger("collecty.graphcache")
+
+		# The least recently used graph comes first
+		self._graphs = collections.OrderedDict()
+
+		# Count requests
+		self._requests = collections.Counter()
+		self._arguments = {}
+
+		# Changes whenever graphs of a template are invalidated
+		self._generations = collections.Counter()
+
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _make_key(template_name, kwargs):
+		"""
+			Returns a key which is the same for all arguments
+			that render the same graph
+		"""
+		kwargs = dict(kwargs)
+
+		# Flushing does not change the graph
+		kwargs.pop("flush", None)
+
+		thumbnail = bool(kwargs.pop("thumbnail", False))
+
+		# Fill in the defaults of GraphTemplate.generate_graph()
+		if thumbnail:
+			default_width, default_height = 80, 20
+		else:
+			default_width, default_height = 960, 480
+
+		args = {
+			"object_id"  : kwargs.pop("object_id", None) or "default",
+			"interval"   : util.make_interval(kwargs.pop("interval", None)),
+			"format"     : (kwargs.pop("format", None) or DEFAULT_IMAGE_FORMAT).upper(),
+			"width"      : int(kwargs.pop("width", None) or default_width),
+			"height"     : int(kwargs.pop("height", None) or default_height),
+			"with_title" : bool(kwargs.pop("with_title", True)),
+			"thumbnail"  : thumbnail,
+			"locale"     : kwargs.pop("locale", None),
+			"timezone"   : kwargs.pop("timezone", None),
+		}
+
+		# Anything else is used as it is
+		args.update(kwargs)
+
+		return (template_name, tuple(sorted(("%s" % k, "%s" % v) for k, v in args.items())))
+
+	def generation(self, template_name):
+		"""
+			Returns a value that changes whenever graphs of the
+			given template are invalidated
+		"""
+		with self._lock:
+			return self._generations[template_name]
+
+	def get(self, template_name, kwargs):
+		"""
+			Returns a copy of the cached graph or None
+		"""
+		key = self._make_key(template_name, kwargs)
+
+		with self._lock:
+			graph = self._graphs.get(key)
+
+			if graph:
+				self._graphs.move_to_end(key)
+
+		if graph:
+			self.log.debug(_("Serving graph %s from cache") % template_name)
+
+			return dict(graph)
+
+	def put(self, template_name, kwargs, graph, generation=None):
+		"""
+			Stores a graph unless its template has been
+			invalidated since generation
+		"""
+		key = self._make_key(template_name, kwargs)
+
+		with self._lock:
+			if generation is not None and not generation == self._generations[template_name]:
+				return
+
+			self._graphs[key] = dict(graph)
+			self._graphs.move_to_end(key)
+
+			# Drop the least recently used graphs
+			while len(self._graphs) > self.MAX_GRAPHS:
+				self._graphs.popitem(last=False)
+
+	def hit(self, template_name, kwargs):
+		"""
+			Counts a request for the given graph
+		"""
+		key = self._make_key(template_name, kwargs)
+
+		with self._lock:
+			self._requests[key] += 1
+			self._arguments[key] = (template_name, dict(kwargs))
+
+			# Forget about the least popular requests
+			if len(self._requests) > 2 * self.MAX_REQUESTS:
+				self._requests = collections.Counter(
+					dict(self._requests.most_common(self.MAX_REQUESTS)))
+
+				self._arguments = {
+					key : self._arguments[key] for key in self._requests
+				}
+
+	def popular(self, n):
+		"""
+			Returns the n most requested graphs
+		"""
+		with self._lock:
+			return [self._arguments[key] for key, count in self._requests.most_common(n)]
+
+	def invalidate(self, template_names=None):
+		"""
+			Drops all cached graphs (of the given templates)
+		"""
+		with self._lock:
+			if template_names is None:
+				template_names = set(key[0] for key in self._graphs) \
+					| set(self._generations)
+
+			template_names = set(template_names)
+
+			for template_name in template_names:
+				self._generations[template_name] += 1
+
+			for key in [key for key in self._graphs if key[0] in template_names]:
+				del self._graphs[key]
+
+	def decay(self):
+		"""
+			Lets old requests fade out
+		"""
+		with self._lock:
+			requests = collections.Counter()
+
+			for key, count in self._requests.most_common(self.MAX_REQUESTS):
+				if count > 1:
+					requests[key] = count // 2
 
-		log.info(_("Backing up to %s..." % filename))
+			self._requests = requests
+			self._arguments = {
+				key : self._arguments[key] for key in self._requests
+			}
 
-		# Opening a compressed tar file with will have all files added to it
-		with tarfile.open(filename, mode="w:gz") as archive:
-			for path, directories, files in os.walk(DATABASE_DIR):
-				for file in files:
-					# Skip any non-RRD files
-					if not file.endswith(".rrd"):
-						continue
 
-					# Compose the full file path
-					file = os.path.join(path, file)
+class Prerenderer(threading.Thread):
+	"""
+		Renders graphs into the graph cache in the background
+		so that the scheduler is never held up by rendering
+	"""
+	def __init__(self, collecty):
+		threading.Thread.__init__(self, name="prerenderer")
+		self.daemon = True
 
-					log.debug(_("Adding %s to backup...") % file)
+		self.collecty = collecty
 
-					with tempfile.NamedTemporaryFile() as t:
-						rrdtool.dump(file, t.name)
+		self._queue = queue.Queue()
 
-						# Add the file to the archive
-						archive.add(
-							t.name, arcname=file[len(DATABASE_DIR):],
-						)
+		# Graphs which are waiting to be rendered
+		self._pending = set()
 
-		log.info(_("Backup finished"))
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+		self._running = True
+
+	def run(self):
+		log.debug(_("Pre-render thread has started"))
+
+		while self._running:
+			request = self._queue.get()
+
+			# Woken up to shut down
+			if request is None:
+				continue
+
+			key, template_name, kwargs = request
+
+			with self._lock:
+				self._pending.discard(key)
+
+			self._render(template_name, kwargs)
+
+		log.debug(_("Pre-render thread has ended"))
+
+	def shutdown(self):
+		log.debug(_("Stopping pre-render thread"))
+
+		self._running = False
+		self._queue.put(None)
+
+		# Return when this thread has finished
+		return self.join()
+
+	def submit(self, template_name, kwargs):
+		"""
+			Queues rendering a graph unless it is queued already
+		"""
+		key = GraphCache._make_key(template_name, kwargs)
+
+		with self._lock:
+			if key in self._pending:
+				return
+
+			self._pending.add(key)
+
+		self._queue.put((key, template_name, kwargs))
+
+	def _render(self, template_name, kwargs):
+		graph_cache = self.collecty.graph_cache
+
+		# Skip if this graph has been requested (and rendered) in the meantime
+		if graph_cache.get(template_name, kwargs):
+			return
+
+		plugin = self.collecty.get_plugin_from_template(template_name)
+		if not plugin:
+			return
+
+		generation = graph_cache.generation(template_name)
+
+		try:
+			graph = plugin.generate_graph(template_name, **kwargs)
+		except Exception as e:
+			log.warning(_("Could not pre-render graph %s: %s") % (template_name, e))
+			return
+
+		graph_cache.put(template_name, kwargs, graph, generation=generation)
 
 
 class WriteQueue(object):
@@ -239,25 +1013,121 @@ class WriteQueue(object):
 
 		self.log = logging.getLogger("collecty.queue")
 
-		# Store data here
-		self._data = []
+		# Store data here grouped by the RRD file it belongs to
+		self._data = {}
+
+		# The latest sample of each RRD database
+		self._latest = {}
+		self._objects = {}
 
 		# Lock to make this class thread-safe
 		self._lock = threading.Lock()
 
+		# Held while rrdtool is writing to any database
+		self.commit_lock = threading.Lock()
+
+		# Held while rrdtool is writing to a database
+		# (each lock is shared by several databases)
+		self._file_locks = [threading.Lock() for i in range(FILE_LOCKS)]
+
 		self.log.debug(_("Initialised write queue"))
 
+	def file_lock(self, filename):
+		"""
+			Returns the lock which is held while rrdtool is writing to filename
+		"""
+		i = hash(os.path.normpath(filename)) % len(self._file_locks)
+
+		return self._file_locks[i]
+
 	def submit(self, object, data):
 		"""
 			Submit a new data point for object
 		"""
+		dataset = object.make_dataset(data)
 		data = QueueObject(object.file, data)
 
+		# Timestamps have a resolution of one second
+		timestamp = datetime.datetime.fromtimestamp(int(data.time),
+			datetime.timezone.utc).replace(tzinfo=None)
+
 		with self._lock:
-			self._data.append(data)
+			try:
+				self._data[object.file].append(data)
+			except KeyError:
+				self._data[object.file] = [data]
+
+			# Remember the latest sample
+			self._latest[object.file] = {
+				"dataset"   : dataset,
+				"timestamp" : timestamp,
+			}
+			self._objects[object.file] = object
 
 		return data
 
+	def has_pending(self, filename):
+		"""
+			Returns True if there is data in the queue which has not
+			been written to the given RRD database, yet
+		"""
+		with self._lock:
+			return filename in self._data
+
+	def size(self):
+		"""
+			Returns the number of samples in the queue and
+			roughly how many bytes they will take up
+		"""
+		with self._lock:
+			samples = [data for results in self._data.values() for data in results]
+
+		return len(samples), sum(len("%s" % data) for data in samples)
+
+	def get_latest(self, object):
+		"""
+			Returns the timestamp and dataset of the latest sample
+			that has been submitted for object (or None)
+		"""
+		with self._lock:
+			latest = self._latest.get(object.file)
+
+		if latest:
+			return dict(latest)
+
+	def set_latest(self, object, timestamp, dataset):
+		"""
+			Sets the latest sample of object unless a newer one
+			has been submitted in the meantime
+		"""
+		latest = {
+			"dataset"   : dataset,
+			"timestamp" : timestamp,
+		}
+
+		with self._lock:
+			latest = self._latest.setdefault(object.file, latest)
+			self._objects.setdefault(object.file, object)
+
+		return dict(latest)
+
+	def forget(self, filenames):
+		"""
+			Drops the latest samples of the given RRD databases
+			so that they will be read from disk again
+		"""
+		with self._lock:
+			for filename in filenames:
+				self._latest.pop(filename, None)
+				self._objects.pop(filename, None)
+
+	def get_all_latest(self):
+		"""
+			Returns a list with all objects and their latest sample
+		"""
+		with self._lock:
+			return [(self._objects[file], latest) for file, latest in self._latest.items()]
+
 	def commit(self):
 		"""
 			Flushes the read data to disk.
@@ -272,19 +1142,9 @@ class WriteQueue(object):
 				self.log.debug(_("No data to commit"))
 				return
 
-			# Get all objects from the queue and group them by the RRD file
-			# to commit them all at once
-			results = {}
-
-			# Group all datapoints by file
-			for data in self._data:
-				try:
-					results[data.file].append(data)
-				except KeyError:
-					results[data.file] = [data]
-
-			# Clear the queue
-			self._data.clear()
+			# Take all data from the queue which is already grouped
+			# by the RRD file to commit them all at once
+			results, self._data = self._data, {}
 
 		# Write the collected data to disk
 		for filename in sorted(results):
@@ -293,6 +1153,9 @@ class WriteQueue(object):
 		duration = time.time() - time_start
 		self.log.debug(_("Emptied write queue in %.2fs") % duration)
 
+		self.collecty.stats.record("commit/duration", duration)
+		self.collecty.stats.record("commit/files", len(results))
+
 	def _commit_file(self, filename, results):
 		self.log.debug(_("Committing %(counter)s entries to %(filename)s") \
 			% { "counter" : len(results), "filename" : filename })
@@ -304,7 +1167,8 @@ class WriteQueue(object):
 			self.log.debug("  %s" % data)
 
 		try:
-			rrdtool.update(filename, *["%s" % r for r in results])
+			with self.file_lock(filename), self.commit_lock:
+				rrdtool.update(filename, *["%s" % r for r in results])
 
 		# Catch operational errors like unreadable/unwritable RRD databases
 		# or those where the format has changed. The collected data will be lost.
@@ -317,23 +1181,10 @@ class WriteQueue(object):
 			Commits all data that is in the write queue for the given
 			RRD database.
 		"""
-		results, others = [], []
-
-		# We will have to walk through the entire queue since we cannot
-		# ready any items selectively. Everything that belongs to our
-		# transaction is kept. Everything else will be put back into the
-		# queue.
 		with self._lock:
-			for data in self._data:
-				if data.file == filename:
-					results.append(data)
-				else:
-					others.append(data)
-
-			# Put back all items that did not match
-			self._data = others
+			results = self._data.pop(filename, None)
 
-		# Write everything else to disk
+		# Write everything to disk that was pending for this file
 		if results:
 			self._commit_file(filename, results)
 
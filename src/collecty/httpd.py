@@ -0,0 +1,416 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import calendar
+import email.utils
+import hashlib
+import http.server
+import json
+import logging
+import math
+import os
+import re
+import socketserver
+import threading
+import urllib.parse
+
+from . import util
+from .constants import *
+from .i18n import _
+
+log = logging.getLogger("collecty.httpd")
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+IMAGE_CONTENT_TYPES = {
+	"PDF" : "application/pdf",
+	"PNG" : "image/png",
+	"SVG" : "image/svg+xml",
+}
+
+class HTTPServer(threading.Thread):
+	def __init__(self, collecty, address):
+		threading.Thread.__init__(self)
+		self.daemon = True
+
+		self.collecty = collecty
+
+		# Generates the metrics page
+		self.exporter = MetricsExporter(self.collecty)
+
+		# Listen on a UNIX socket
+		if address.startswith("unix:"):
+			path = address[5:]
+
+			# Remove any stale sockets
+			if os.path.exists(path):
+				os.unlink(path)
+
+			self.server = ThreadingUnixHTTPServer(path, RequestHandler)
+
+		# Listen on a TCP port
+		else:
+			host, port = self._parse_address(address)
+
+			self.server = http.server.ThreadingHTTPServer((host, port), RequestHandler)
+
+		self.server.daemon_threads = True
+		self.server.httpd = self
+
+	@staticmethod
+	def _parse_address(address):
+		host, delim, port = address.rpartition(":")
+
+		try:
+			port = int(port)
+		except ValueError:
+			raise ValueError(_("Invalid address: %s") % address)
+
+		# Strip any brackets around IPv6 addresses
+		return host.strip("[]") or "localhost", port
+
+	def run(self):
+		log.debug(_("HTTP server thread has started"))
+
+		self.server.serve_forever()
+
+		log.debug(_("HTTP server thread has ended"))
+
+	def shutdown(self):
+		log.debug(_("Stopping HTTP server thread"))
+
+		self.server.shutdown()
+		self.server.server_close()
+
+		# Return when this thread has finished
+		return self.join()
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	pass
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+	# Keep connections alive
+	protocol_version = "HTTP/1.1"
+
+	routes = (
+		(r"^/metrics$", "handle_metrics"),
+		(r"^/graph/([^/]+)(?:/([^/]+))?$", "handle_graph"),
+		(r"^/series/([^/]+)(?:/([^/]+))?$", "handle_series"),
+	)
+
+	@property
+	def httpd(self):
+		return self.server.httpd
+
+	@property
+	def collecty(self):
+		return self.httpd.collecty
+
+	def log_message(self, format, *args):
+		log.debug(format % args)
+
+	def send_body(self, body, content_type, status=200, headers=None):
+		self.send_response(status)
+		self.send_header("Content-Type", content_type)
+		self.send_header("Content-Length", "%s" % len(body))
+
+		for header, value in (headers or {}).items():
+			self.send_header(header, value)
+
+		self.end_headers()
+
+		# HEAD requests only receive the headers
+		if not self.command == "HEAD":
+			self.wfile.write(body)
+
+	def do_GET(self):
+		path, delim, query = self.path.partition("?")
+
+		# Parse the query string
+		self.arguments = {
+			k : v[-1] for k, v in urllib.parse.parse_qs(query).items()
+		}
+
+		for pattern, handler in self.routes:
+			m = re.match(pattern, path)
+			if not m:
+				continue
+
+			args = [urllib.parse.unquote(arg) for arg in m.groups() if arg]
+
+			try:
+				return getattr(self, handler)(*args)
+
+			# Templates or objects that could not be found
+			except RuntimeError as e:
+				return self.send_error(404, "%s" % e)
+
+			except ValueError as e:
+				return self.send_error(400, "%s" % e)
+
+			except Exception:
+				log.error(_("Could not handle request for %s") % path, exc_info=True)
+
+				return self.send_error(500)
+
+		self.send_error(404)
+
+	# HEAD is handled like GET, but without sending the body
+	do_HEAD = do_GET
+
+	def get_argument(self, name, type=str, default=None):
+		try:
+			value = self.arguments[name]
+		except KeyError:
+			return default
+
+		if type is bool:
+			return value.lower() in ("1", "yes", "true", "on")
+
+		return type(value)
+
+	def check_cache(self, template_name, object_id, arguments):
+		"""
+			Returns headers for conditional requests, or None
+			if the client already has the latest version
+		"""
+		last_modified = self._get_last_modified(template_name, object_id)
+
+		# We cannot do any caching if we don't know when the data has changed
+		if last_modified is None:
+			return {}
+
+		etag = hashlib.sha1(("%s:%s:%s:%s" % (
+			template_name, object_id, sorted(arguments.items()), last_modified,
+		)).encode()).hexdigest()
+
+		headers = {
+			"Cache-Control" : "no-cache",
+			"ETag"          : "\"%s\"" % etag,
+			"Last-Modified" : email.utils.formatdate(last_modified, usegmt=True),
+		}
+
+		if self._is_not_modified(headers["ETag"], last_modified):
+			self.send_response(304)
+
+			for header, value in headers.items():
+				self.send_header(header, value)
+
+			self.end_headers()
+
+			return None
+
+		return headers
+
+	def _get_last_modified(self, template_name, object_id):
+		"""
+			Returns when the latest sample of any object that is
+			used by the given template has been collected
+		"""
+		plugin = self.collecty.get_plugin_from_template(template_name)
+		if not plugin:
+			raise RuntimeError("Could not find template %s" % template_name)
+
+		template = plugin.get_template(template_name, object_id)
+
+		if not template.objects:
+			raise RuntimeError("Could not find object %s" % object_id)
+
+		timestamps = [o.last_update().get("timestamp") for o in template.objects]
+		timestamps = [calendar.timegm(t.timetuple()) for t in timestamps if t]
+
+		if timestamps:
+			return max(timestamps)
+
+	def _is_not_modified(self, etag, last_modified):
+		if_none_match = self.headers.get("If-None-Match")
+
+		# If-None-Match takes precedence over If-Modified-Since
+		if if_none_match:
+			return etag in (e.strip() for e in if_none_match.split(",")) or if_none_match == "*"
+
+		if_modified_since = self.headers.get("If-Modified-Since")
+
+		if if_modified_since:
+			try:
+				if_modified_since = email.utils.parsedate_to_datetime(if_modified_since)
+			except (TypeError, ValueError):
+				return False
+
+			return last_modified <= if_modified_since.timestamp()
+
+		return False
+
+	def handle_metrics(self):
+		self.send_body(self.httpd.exporter.export(), OPENMETRICS_CONTENT_TYPE)
+
+	def handle_graph(self, template_name, object_id="default"):
+		kwargs = {
+			"object_id" : object_id,
+		}
+
+		for name, type in (("interval", str), ("format", str), ("locale", str), ("timezone", str),
+				("width", int), ("height", int), ("thumbnail", bool)):
+			value = self.get_argument(name, type=type)
+
+			if value is not None:
+				kwargs[name] = value
+
+		format = kwargs.get("format", DEFAULT_IMAGE_FORMAT).upper()
+		if not format in SUPPORTED_IMAGE_FORMATS:
+			raise ValueError(_("Unsupported image format: %s") % format)
+
+		kwargs["format"] = format
+
+		headers = self.check_cache(template_name, object_id, kwargs)
+		if headers is None:
+			return
+
+		graph = self.collecty.generate_graph(template_name, **kwargs)
+
+		self.send_body(graph["image"], IMAGE_CONTENT_TYPES[format], headers=headers)
+
+	def handle_series(self, template_name, object_id="default"):
+		kwargs = {
+			"object_id" : object_id,
+		}
+
+		for name, type in (("interval", str), ("resolution", int), ("cf", str),
+				("points", int), ("method", str)):
+			value = self.get_argument(name, type=type)
+
+			if value is not None:
+				kwargs[name] = value
+
+		headers = self.check_cache(template_name, object_id, kwargs)
+		if headers is None:
+			return
+
+		series = self.collecty.fetch_series(template_name, **kwargs)
+
+		# Unpack all series (NaN is not valid JSON)
+		for key in ("series", "timestamps", "minimum", "maximum"):
+			if not key in series:
+				continue
+
+			series[key] = {
+				name : [None if math.isnan(v) else v for v in util.unpack_values(values)]
+					for name, values in series[key].items()
+			}
+
+		self.send_body(json.dumps(series).encode(), "application/json", headers=headers)
+
+
+class MetricsExporter(object):
+	"""
+		Exports the latest sample of all objects in the OpenMetrics format
+	"""
+	def __init__(self, collecty):
+		self.collecty = collecty
+
+		# Metric names and labels for each RRD database
+		self._lines = {}
+
+		# The type of all metric families
+		self._families = {}
+
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _make_name(*parts):
+		return re.sub(r"[^A-Za-z0-9_]", "_", "_".join(parts))
+
+	@staticmethod
+	def _escape(value):
+		return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+	def _get_lines(self, object):
+		"""
+			Returns the family and the beginning of the line
+			for each data source of object
+		"""
+		try:
+			return self._lines[object.file]
+		except KeyError:
+			pass
+
+		lines = []
+		labels = "{object=\"%s\"}" % self._escape(object.id)
+
+		for name, type in object.rrd_schema_types:
+			family = self._make_name("collecty", object.plugin.name, name)
+
+			if type in ("COUNTER", "DERIVE"):
+				self._families[family] = "counter"
+				lines.append((family, "%s_total%s " % (family, labels)))
+
+			else:
+				self._families[family] = "gauge"
+				lines.append((family, "%s%s " % (family, labels)))
+
+		self._lines[object.file] = lines
+
+		return lines
+
+	def export(self):
+		"""
+			Returns the metrics page
+		"""
+		families = {}
+
+		with self._lock:
+			files = set()
+
+			for object, latest in self.collecty.write_queue.get_all_latest():
+				files.add(object.file)
+
+				# Skip anything that has never been collected
+				if latest["timestamp"] is None or latest["dataset"] is None:
+					continue
+
+				timestamp = " %s" % calendar.timegm(latest["timestamp"].timetuple())
+
+				for (family, line), value in zip(self._get_lines(object), latest["dataset"].values()):
+					try:
+						samples = families[family]
+					except KeyError:
+						samples = families[family] = []
+
+					samples.append(
+						"%s%s%s" % (line, "NaN" if value is None else repr(value), timestamp),
+					)
+
+			# Forget about all objects that have disappeared
+			for file in [f for f in self._lines if not f in files]:
+				del self._lines[file]
+
+			output = []
+
+			for family in sorted(families):
+				output.append("# TYPE %s %s" % (family, self._families[family]))
+				output += families[family]
+
+		output.append("# EOF\n")
+
+		return "\n".join(output).encode()
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import logging
+import threading
+import time
+import uuid
+
+from .i18n import _
+
+log = logging.getLogger("collecty.jobs")
+
+class Job(threading.Thread):
+	"""
+		A long-running task (like a backup) that is executed in the
+		background and reports its progress
+	"""
+	def __init__(self, name, func, *args, **kwargs):
+		threading.Thread.__init__(self, name=name)
+		self.daemon = True
+
+		self.id = uuid.uuid4().hex
+
+		self.func = func
+		self.args = args
+		self.kwargs = kwargs
+
+		self.state = "pending"
+		self.error = None
+		self.result = None
+
+		# Progress
+		self.done, self.total = 0, 0
+
+		self.time_started = None
+		self.time_finished = None
+
+		self._callbacks = []
+		self._lock = threading.Lock()
+
+	def __repr__(self):
+		return "<%s %s %s>" % (self.__class__.__name__, self.name, self.id)
+
+	def run(self):
+		log.debug(_("Job %s has started") % self)
+
+		self.state = "running"
+		self.time_started = time.time()
+
+		try:
+			self.result = self.func(self, *self.args, **self.kwargs)
+
+		except Exception as e:
+			log.error(_("Job %s failed: %s") % (self, e), exc_info=True)
+
+			self.state = "failed"
+			self.error = "%s" % e
+
+		else:
+			self.state = "finished"
+
+		finally:
+			self.time_finished = time.time()
+
+			with self._lock:
+				callbacks, self._callbacks = self._callbacks, []
+
+			for callback in callbacks:
+				callback(self)
+
+		log.debug(_("Job %s has ended") % self)
+
+	@property
+	def finished(self):
+		return self.state in ("finished", "failed")
+
+	def advance(self, n=1):
+		"""
+			Marks n more items as done
+		"""
+		with self._lock:
+			self.done += n
+
+	def add_callback(self, callback):
+		"""
+			Calls callback with this job as soon as it has finished
+		"""
+		with self._lock:
+			if not self.finished:
+				self._callbacks.append(callback)
+				return
+
+		callback(self)
+
+	def status(self):
+		"""
+			Returns a dictionary with the current state of this job
+		"""
+		status = {
+			"id"    : self.id,
+			"name"  : self.name,
+			"state" : self.state,
+			"done"  : self.done,
+			"total" : self.total,
+		}
+
+		if self.error:
+			status["error"] = self.error
+
+		if self.time_started:
+			status["started"] = self.time_started
+
+		if self.time_finished:
+			status["finished"] = self.time_finished
+
+		return status
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import logging
+import numpy
+import threading
+import time
+
+from . import series
+from .i18n import _
+
+log = logging.getLogger("collecty.live")
+
+# Data source types which store counters that have to be converted into rates
+COUNTER_TYPES = ("COUNTER", "DERIVE")
+
+class RingBuffer(object):
+	"""
+		Holds the most recent samples of one object in a fixed-size array
+	"""
+	def __init__(self, columns, size):
+		self.size = size
+
+		self._timestamps = numpy.full(size, numpy.nan)
+		self._values = numpy.full((size, columns), numpy.nan)
+
+		# The position where the next sample will be written to
+		self._pos = 0
+
+		# The number of samples in the buffer
+		self._count = 0
+
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return self._count
+
+	def push(self, timestamp, values):
+		with self._lock:
+			self._timestamps[self._pos] = timestamp
+			self._values[self._pos] = values
+
+			self._pos = (self._pos + 1) % self.size
+			self._count = min(self._count + 1, self.size)
+
+	def get(self, count=None):
+		"""
+			Returns the timestamps and values of the last count
+			samples in chronological order
+		"""
+		with self._lock:
+			n = self._count
+
+			if count:
+				n = min(n, count)
+
+			indices = (self._pos - n + numpy.arange(n)) % self.size
+
+			return self._timestamps[indices], self._values[indices]
+
+
+class LiveStore(object):
+	"""
+		Keeps a ring buffer with live samples for each object
+	"""
+	def __init__(self, collecty):
+		self.collecty = collecty
+
+		self._buffers = {}
+
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+	def push(self, object, data):
+		"""
+			Stores a new sample for object
+		"""
+		dataset = object.make_dataset(data)
+
+		values = [numpy.nan if v is None else v for v in dataset.values()]
+
+		with self._lock:
+			try:
+				buffer = self._buffers[object.file]
+			except KeyError:
+				buffer = self._buffers[object.file] = \
+					RingBuffer(len(values), object.plugin.live_samples)
+
+		buffer.push(time.time(), values)
+
+	def forget(self, filenames):
+		"""
+			Drops the live samples of the given objects
+		"""
+		with self._lock:
+			for filename in filenames:
+				self._buffers.pop(filename, None)
+
+	def get_series(self, object, count=None):
+		"""
+			Returns the live samples of object with each series
+			packed as little-endian doubles.
+
+			Counters are converted into rates per second.
+		"""
+		with self._lock:
+			buffer = self._buffers.get(object.file)
+
+		if buffer is None:
+			raise RuntimeError(_("No live data available for %s") % object)
+
+		timestamps, values = buffer.get(count)
+
+		ret = {
+			"names"      : [],
+			"timestamps" : series.pack(timestamps),
+			"series"     : {},
+		}
+
+		for i, (name, type) in enumerate(object.rrd_schema_types):
+			column = values[:, i]
+
+			if type in COUNTER_TYPES:
+				column = self._make_rates(timestamps, column)
+
+			ret["names"].append(name)
+			ret["series"][name] = series.pack(column)
+
+		return ret
+
+	@staticmethod
+	def _make_rates(timestamps, values):
+		rates = numpy.full(len(values), numpy.nan)
+
+		with numpy.errstate(invalid="ignore", divide="ignore"):
+			rates[1:] = numpy.diff(values) / numpy.diff(timestamps)
+
+		# Counter resets would result in negative rates
+		rates[rates < 0] = numpy.nan
+
+		return rates
@@ -22,6 +22,7 @@
 from .base import get
 
 from . import base
+from . import collecty
 from . import contextswitches
 from . import conntrack
 from . import cpufreq
@@ -19,33 +19,68 @@
 #                                                                             #
 ###############################################################################
 
+import collections
+import fnmatch
 import logging
+import math
+import numpy
 import os
 import re
 import rrdtool
+import threading
 import time
 import unicodedata
 
+from .. import analytics
+from .. import series
 from .. import util
+from .. import workers
 from ..constants import *
 from ..i18n import _
 
 DEF_MATCH = r"C?DEF:([A-Za-z0-9_]+)="
 
+DEFAULT_LOCALE   = "en_US.utf-8"
+DEFAULT_TIMEZONE = "UTC"
+
+# Number of collections over budget in a row before backing off further
+BACKOFF_STRIKES = 3
+
+# Number of collections within budget before recovering one step
+BACKOFF_RECOVERY = 5
+
+# At most, a plugin will only collect on every n-th tick. Any longer
+# gap would exceed the heartbeat of the databases and be stored as unknown.
+MAX_BACKOFF = 2
+
+# The longest time (in seconds) an object that
+# keeps timing out is not collected
+MAX_QUARANTINE = 3600
+
+# How often (in seconds) the objects of a plugin are discovered again
+DISCOVERY_INTERVAL = 300
+
 class Environment(object):
 	"""
 		Sets the correct environment for rrdtool to create
 		localised graphs and graphs in the correct timezone.
+
+		The environment is shared by the whole process, so only
+		one graph can be rendered at a time.
 	"""
-	def __init__(self, timezone="UTC", locale="en_US.utf-8"):
+	lock = threading.RLock()
+
+	def __init__(self, timezone=None, locale=None):
 		# Build the new environment
 		self.new_environment = {
-			"LANGUAGE" : locale,
-			"LC_ALL"   : locale,
-			"TZ"       : timezone,
+			"LANGUAGE" : locale or DEFAULT_LOCALE,
+			"LC_ALL"   : locale or DEFAULT_LOCALE,
+			"TZ"       : timezone or DEFAULT_TIMEZONE,
 		}
 
 	def __enter__(self):
+		self.lock.acquire()
+
 		# Save the current environment
 		self.old_environment = {}
 
@@ -66,6 +101,8 @@ class Environment(object):
 			else:
 				os.environ[k] = v
 
+		self.lock.release()
+
 
 class PluginRegistration(type):
 	plugins = {}
@@ -78,6 +115,10 @@ class PluginRegistration(type):
 		if name == "Plugin":
 			return
 
+		# Neither are plugins which are only ever added explicitly
+		if not dict.get("register", True):
+			return
+
 		if not all((plugin.name, plugin.description)):
 			raise RuntimeError(_("Plugin is not properly configured: %s") % plugin)
 
@@ -107,6 +148,26 @@ class Plugin(object, metaclass=PluginRegistration):
 	# Priority
 	priority = 0
 
+	# If set, all objects are additionally sampled at this interval
+	# and the samples are kept in an in-memory ring buffer
+	# (this is only enabled through the configuration)
+	live_interval = None
+
+	# The number of live samples that are kept for each object
+	live_samples = 720
+
+	# The wall time and CPU time (in seconds) a collection may take
+	# (None or 0 disables the budget)
+	budget = None
+	cpu_budget = None
+
+	# If set, overrides the timeout of all objects (0 disables timeouts)
+	timeout = None
+
+	# Set if objects use the state of the daemon and must therefore
+	# never be collected in a worker process or for live data
+	in_process = False
+
 	def __init__(self, collecty, **kwargs):
 		self.collecty = collecty
 
@@ -117,9 +178,39 @@ class Plugin(object, metaclass=PluginRegistration):
 		# Initialize the logger.
 		self.log = logging.getLogger("collecty.plugins.%s" % self.name)
 
+		# Index all templates by their name
+		self._templates = { t.name : t for t in self.templates }
+
+		# An index of all objects by their ID which
+		# is updated whenever objects are discovered
+		self._objects = {}
+		self._discovered = None
+
+		# Patterns of object IDs which are collected or skipped
+		self.include = None
+		self.exclude = None
+
+		# Only every n-th tick is collected while backing off
+		self.backoff = 1
+
+		self._ticks = 0
+		self._strikes = 0
+		self._calm = 0
+
 		# Run some custom initialization.
 		self.init(**kwargs)
 
+		# Remember what to go back to when the configuration is removed
+		self._defaults = {
+			"interval"   : self.interval,
+			"priority"   : self.priority,
+			"budget"     : self.budget,
+			"cpu_budget" : self.cpu_budget,
+			"timeout"    : self.timeout,
+
+			"live_interval" : self.live_interval,
+		}
+
 		self.log.debug(_("Successfully initialized %s") % self.__class__.__name__)
 
 	@property
@@ -138,17 +229,186 @@ class Plugin(object, metaclass=PluginRegistration):
 		"""
 		pass
 
+	def configure(self, config):
+		"""
+			Applies the configuration section of this plugin
+		"""
+		self.interval = config.getint("interval", fallback=self._defaults["interval"])
+		self.priority = config.getint("priority", fallback=self._defaults["priority"])
+
+		self.budget = config.getfloat("budget", fallback=self._defaults["budget"])
+		self.cpu_budget = config.getfloat("cpu-budget", fallback=self._defaults["cpu_budget"])
+
+		self.timeout = config.getfloat("timeout", fallback=self._defaults["timeout"])
+
+		self.live_interval = config.getint("live-interval",
+			fallback=self._defaults["live_interval"])
+
+		# Live collections would take the state away from regular ones
+		if self.in_process:
+			self.live_interval = None
+
+		self.include = config.getlist("include", fallback=None)
+		self.exclude = config.getlist("exclude", fallback=None)
+
+		# Apply include/exclude with the next discovery
+		self._discovered = None
+
+	def is_wanted(self, object_id):
+		"""
+			Returns True if the object with the given ID should be collected
+		"""
+		if self.include:
+			if not any(fnmatch.fnmatchcase(object_id, p) for p in self.include):
+				return False
+
+		if self.exclude:
+			if any(fnmatch.fnmatchcase(object_id, p) for p in self.exclude):
+				return False
+
+		return True
+
 	def collect(self):
 		"""
 			Gathers the statistical data, this plugin collects.
 		"""
 		time_start = time.time()
+		cpu_start = time.thread_time()
 
 		# Run through all objects of this plugin and call the collect method.
-		for object in self.objects:
+		for object, result in self._collect_objects(self.get_objects()):
+			# Add the object to the write queue so that the data is written
+			# to the databases later.
+			if self.collecty.bus:
+				self.collecty.bus.publish(object, result)
+
+			result = self.collecty.write_queue.submit(object, result)
+
+			self.log.debug(_("Collected %s: %s") % (object, result))
+
+		# Returns the time this function took to complete.
+		delay = time.time() - time_start
+
+		stats = self.collecty.stats
+		stats.record("collect/%s" % self.name, delay)
+		stats.record("cpu/%s" % self.name, time.thread_time() - cpu_start)
+
+		# The next collection should have started already
+		if delay > self.interval:
+			stats.record("overruns/%s" % self.name, 1)
+
+		# Back off if this is getting too expensive
+		self._account(delay, time.thread_time() - cpu_start)
+
+		# Log some warning when a collect method takes too long to return some data
+		if delay >= 60:
+			self.log.warning(_("A worker thread was stalled for %.4fs") % delay)
+		else:
+			self.log.debug(_("Collection finished in %.2fms") % (delay * 1000))
+
+	def should_skip(self, overloaded=False):
+		"""
+			Called on every tick. Returns True if this tick should not
+			be collected because the plugin is backing off.
+		"""
+		# Back off further for as long as the system is overloaded
+		if overloaded:
+			self._calm = 0
+			self._back_off()
+
+		self.collecty.stats.record("backoff/%s" % self.name, self.backoff)
+
+		self._ticks += 1
+
+		return self._ticks % self.backoff > 0
+
+	def skip(self):
+		"""
+			Called instead of collect() for a skipped tick
+
+			Nothing is written, because an unknown value would also make
+			the next value of every COUNTER and DERIVE data source unknown.
+			rrdtool interpolates over short gaps and stores anything longer
+			than the heartbeat as unknown on its own.
+		"""
+		self.collecty.stats.record("skipped/%s" % self.name, 1)
+
+	def _account(self, duration, cpu):
+		"""
+			Backs off if collections keep going over budget and
+			recovers once they are within budget again
+		"""
+		if (self.budget and duration > self.budget) \
+				or (self.cpu_budget and cpu > self.cpu_budget):
+			self._calm = 0
+			self._strikes += 1
+
+			if self._strikes >= BACKOFF_STRIKES:
+				self._back_off()
+
+			return
+
+		self._strikes = 0
+
+		if self.backoff > 1:
+			self._calm += 1
+
+			if self._calm >= BACKOFF_RECOVERY:
+				self._calm = 0
+				self.backoff //= 2
+
+				self.log.info(_("Recovering, collecting every %s. tick") % self.backoff)
+
+	def _back_off(self):
+		self._strikes = 0
+
+		if self.backoff >= MAX_BACKOFF:
+			return
+
+		self.backoff *= 2
+
+		self.log.warning(_("Backing off, collecting only every %s. tick") % self.backoff)
+
+	def collect_live(self):
+		"""
+			Gathers live data which is only kept in memory
+		"""
+		# Use the objects that have been discovered by the last collection
+		for object, result in self._collect_objects(self.get_objects()):
+			if self.collecty.bus:
+				self.collecty.bus.publish(object, result)
+
+			self.collecty.live.push(object, result)
+
+	def _collect_objects(self, objects):
+		"""
+			Calls the collect method of all objects and
+			yields each object with its result.
+		"""
+		quarantined = 0
+
+		for object in objects:
+			# Don't collect objects which keep timing out for a while
+			if object.quarantined:
+				quarantined += 1
+
+				yield object, object.unknown()
+				continue
+
 			# Run collection
 			try:
-				result = object.collect()
+				result = object.run_collect()
+
+			# The object has been killed
+			except TimeoutError:
+				self.log.warning(_("Collection of %s timed out after %ss") \
+					% (object, object.get_timeout()))
+
+				self.collecty.stats.record("timeouts/%s" % self.name, 1)
+				object.quarantine()
+
+				yield object, object.unknown()
+				continue
 
 			# Catch any unhandled exceptions
 			except Exception as e:
@@ -159,34 +419,107 @@ class Plugin(object, metaclass=PluginRegistration):
 				self.log.warning(_("Received empty result: %s") % object)
 				continue
 
-			# Add the object to the write queue so that the data is written
-			# to the databases later.
-			result = self.collecty.write_queue.submit(object, result)
+			yield object, result
 
-			self.log.debug(_("Collected %s: %s") % (object, result))
+		if quarantined:
+			self.collecty.stats.record("quarantined/%s" % self.name, quarantined)
 
-		# Returns the time this function took to complete.
-		delay = time.time() - time_start
+	def update_objects(self):
+		"""
+			Discovers all objects of this plugin and updates the index.
 
-		# Log some warning when a collect method takes too long to return some data
-		if delay >= 60:
-			self.log.warning(_("A worker thread was stalled for %.4fs") % delay)
-		else:
-			self.log.debug(_("Collection finished in %.2fms") % (delay * 1000))
+			Objects that are already known are kept, objects that
+			have disappeared are removed.
+		"""
+		objects = {}
 
-	def get_object(self, id):
 		for object in self.objects:
-			if not object.id == id:
+			# Skip anything that has been configured away
+			if not self.is_wanted(object.id):
 				continue
 
-			return object
+			objects[object.id] = self._objects.get(object.id, object)
 
-	def get_template(self, template_name, object_id, locale=None, timezone=None):
-		for template in self.templates:
-			if not template.name == template_name:
+		# Drop the live samples and latest values of all objects that have disappeared
+		disappeared = [o.file for id, o in self._objects.items() if not id in objects]
+
+		self.collecty.live.forget(disappeared)
+		self.collecty.write_queue.forget(disappeared)
+
+		# Check the databases when they are discovered for the first time
+		# after the plugin has been (re)configured
+		if self._discovered is None:
+			self._check_step(objects.values())
+
+		self._objects = objects
+		self._discovered = time.monotonic()
+
+		return list(objects.values())
+
+	def _check_step(self, objects):
+		"""
+			Warns if the databases have been created with a different
+			interval (which cannot be changed after they have been created)
+		"""
+		for object in objects:
+			try:
+				step = object.info()["step"]
+			except rrdtool.OperationalError:
 				continue
 
-			return template(self, object_id, locale=locale, timezone=timezone)
+			if not step == object.stepsize:
+				self.log.warning(_("The databases of %(plugin)s have a step of %(step)ss "
+					"which does not match the interval of %(interval)ss") % {
+						"plugin"   : self.name,
+						"step"     : step,
+						"interval" : object.stepsize,
+					})
+
+			# All databases of a plugin have the same step
+			return
+
+	def _discovered_since(self, seconds):
+		"""
+			Returns True if objects have been discovered within the last seconds
+		"""
+		if self._discovered is None:
+			return False
+
+		return time.monotonic() - self._discovered < seconds
+
+	def get_objects(self):
+		"""
+			Returns all known objects and discovers them
+			again if that has not happened for a while
+		"""
+		if not self._discovered_since(DISCOVERY_INTERVAL):
+			return self.update_objects()
+
+		return list(self._objects.values())
+
+	def get_object(self, id):
+		try:
+			return self._objects[id]
+		except KeyError:
+			pass
+
+		# The object might have appeared since it was last discovered,
+		# but don't let anyone trigger discovering everything again
+		# just by asking for objects that don't exist
+		if self._discovered_since(self.interval):
+			return
+
+		self.update_objects()
+
+		return self._objects.get(id)
+
+	def get_template(self, template_name, object_id, locale=None, timezone=None):
+		try:
+			template = self._templates[template_name]
+		except KeyError:
+			return
+
+		return template(self, object_id, locale=locale, timezone=timezone)
 
 	def generate_graph(self, template_name, object_id="default",
 			timezone=None, locale=None, **kwargs):
@@ -204,6 +537,8 @@ class Plugin(object, metaclass=PluginRegistration):
 		self.log.debug(_("Generated graph %s in %.1fms") \
 			% (template, duration * 1000))
 
+		self.collecty.stats.record("render", duration)
+
 		return graph
 
 	def graph_info(self, template_name, object_id="default",
@@ -222,11 +557,49 @@ class Plugin(object, metaclass=PluginRegistration):
 
 		return object.last_update()
 
+	def fetch_series(self, object_id="default", **kwargs):
+		object = self.get_object(object_id)
+		if not object:
+			raise RuntimeError("Could not find object %s" % object_id)
+
+		return object.fetch_series(**kwargs)
+
+	def live_series(self, object_id="default", count=None):
+		object = self.get_object(object_id)
+		if not object:
+			raise RuntimeError("Could not find object %s" % object_id)
+
+		return self.collecty.live.get_series(object, count=count)
+
+	def analyse(self, object_ids=None, **kwargs):
+		"""
+			Computes statistics over the given (or all) objects at once
+		"""
+		if object_ids is None:
+			objects = self.get_objects()
+		else:
+			objects = []
+
+			for object_id in object_ids:
+				object = self.get_object(object_id)
+				if not object:
+					raise RuntimeError("Could not find object %s" % object_id)
+
+				objects.append(object)
+
+		return analytics.analyse(objects, **kwargs)
+
 
 class Object(object):
 	# The schema of the RRD database.
 	rrd_schema = None
 
+	# If set, collect() runs in a separate process which is
+	# killed if it does not return within this many seconds.
+	# Forking for every collection is expensive, so this is
+	# only set for objects that are known to hang.
+	timeout = None
+
 	# RRA properties.
 	rra_types     = ("AVERAGE", "MIN", "MAX")
 	rra_timespans = (
@@ -238,6 +611,13 @@ class Object(object):
 	def __init__(self, plugin, *args, **kwargs):
 		self.plugin = plugin
 
+		# Set once the RRD database is known to exist
+		self._created = False
+
+		# Consecutive timeouts and until when this object is not collected
+		self._timeouts = 0
+		self._quarantined_until = None
+
 		# Initialise this object
 		self.init(*args, **kwargs)
 
@@ -273,7 +653,7 @@ class Object(object):
 		"""
 		filename = self._normalise_filename("%s.rrd" % self.id)
 
-		return os.path.join(DATABASE_DIR, self.plugin.path, filename)
+		return os.path.join(self.collecty.database_dir, self.plugin.path, filename)
 
 	@staticmethod
 	def _normalise_filename(filename):
@@ -293,12 +673,76 @@ class Object(object):
 		"""
 		pass
 
+	def get_timeout(self):
+		# Anything that happens in a worker process is lost
+		if self.plugin.in_process:
+			return None
+
+		if self.plugin.timeout is not None:
+			return self.plugin.timeout
+
+		return self.timeout
+
+	def run_collect(self):
+		"""
+			Calls collect() and enforces the timeout
+		"""
+		timeout = self.get_timeout()
+
+		if not timeout:
+			return self.collect()
+
+		result = workers.run(self.collect, timeout)
+
+		# Recover after the object has returned in time again
+		self._timeouts = 0
+
+		return result
+
+	def quarantine(self):
+		"""
+			Stops collecting this object for a while which doubles
+			every time it times out in a row
+		"""
+		self._timeouts += 1
+
+		duration = min(self.plugin.interval * 2 ** self._timeouts, MAX_QUARANTINE)
+
+		self.log.warning(_("Not collecting %s for %ss") % (self, duration))
+
+		self._quarantined_until = time.monotonic() + duration
+
+	@property
+	def quarantined(self):
+		if self._quarantined_until is None:
+			return False
+
+		return time.monotonic() < self._quarantined_until
+
+	def unknown(self):
+		"""
+			Returns a sample where all values are unknown
+		"""
+		return [None] * len(self.rrd_schema_names)
+
+	def reset(self):
+		"""
+			Forgets everything that is known about the RRD file
+			after it has been replaced on disk
+		"""
+		self._created = False
+
 	def create(self):
 		"""
 			Creates an empty RRD file with the desired data structures.
 		"""
+		# Skip if we have created or seen the file before
+		if self._created:
+			return
+
 		# Skip if the file does already exist.
 		if os.path.exists(self.file):
+			self._created = True
 			return
 
 		dirname = os.path.dirname(self.file)
@@ -309,6 +753,7 @@ class Object(object):
 		args = self.get_rrd_schema()
 
 		rrdtool.create(self.file, *args)
+		self._created = True
 
 		self.log.debug(_("Created RRD file %s.") % self.file)
 		for arg in args:
@@ -322,10 +767,42 @@ class Object(object):
 			Returns a dictionary with the timestamp and
 			data set of the last database update.
 		"""
-		return {
-			"dataset"   : self.last_dataset,
-			"timestamp" : self.last_updated,
-		}
+		# Serve the latest sample from memory if we have one
+		latest = self.collecty.write_queue.get_latest(self)
+
+		if latest is None:
+			lu = self._last_update() or {}
+
+			# Remember what is in the database
+			latest = self.collecty.write_queue.set_latest(self,
+				lu.get("date"), lu.get("ds"))
+
+		return latest
+
+	def make_dataset(self, data):
+		"""
+			Converts collected data into a dictionary
+			with a numeric value for each data source.
+
+			Unknown values are returned as None.
+		"""
+		if not isinstance(data, tuple) and not isinstance(data, list):
+			data = [data]
+
+		dataset = {}
+
+		for name, value in zip(self.rrd_schema_names, data):
+			try:
+				value = float(value)
+			except (TypeError, ValueError):
+				value = None
+
+			if value is not None and math.isnan(value):
+				value = None
+
+			dataset[name] = value
+
+		return dataset
 
 	def _last_update(self):
 		return rrdtool.lastupdate(self.file)
@@ -398,6 +875,19 @@ class Object(object):
 
 		return ret
 
+	@property
+	def rrd_schema_types(self):
+		"""
+			Returns a list with the name and type of each data source
+		"""
+		ret = []
+
+		for line in self.rrd_schema:
+			(prefix, name, type, lower_limit, upper_limit) = line.split(":")
+			ret.append((name, type))
+
+		return ret
+
 	def make_rrd_defs(self, prefix=None):
 		defs = []
 
@@ -414,19 +904,97 @@ class Object(object):
 		return defs
 
 	def get_stddev(self, interval=None):
-		args = self.make_rrd_defs()
+		stats = analytics.analyse([self], interval=interval, percentiles=None)
 
-		# Add the correct interval
-		args += ["--start", util.make_interval(interval)]
+		return { name : s["stddev"] for name, s in stats[self.id].items() }
 
-		for name in self.rrd_schema_names:
-			args += [
-				"VDEF:%s_stddev=%s,STDEV" % (name, name),
-				"PRINT:%s_stddev:%%lf" % name,
-			]
+	def fetch(self, interval=None, resolution=None, cf="AVERAGE", flush=True):
+		"""
+			Fetches the consolidated data of all data sources
+
+			Returns the start and end timestamp, the step, the names
+			of the data sources and a list with one tuple per row.
+
+			If flush is False, samples that are still waiting in
+			the write queue will not be part of the result.
+		"""
+		# Make sure that all collected data is in the database
+		if flush:
+			self.commit()
+
+		args = [
+			"--start", util.make_interval(interval),
+		]
+
+		if resolution:
+			args += ["--resolution", "%s" % resolution]
+
+		(start, end, step), names, rows = rrdtool.fetch(self.file, cf, *args)
+
+		return start, end, step, names, rows
+
+	def fetch_series(self, points=None, method="lttb", **kwargs):
+		"""
+			Returns the consolidated data of all data sources
+			with each series packed as little-endian doubles.
+
+			If points is given, the series will be downsampled
+			to roughly that many points.
+		"""
+		start, end, step, names, rows = self.fetch(**kwargs)
+
+		values = series.make_array(rows, len(names))
+
+		ret = {
+			"start"  : start,
+			"end"    : end,
+			"step"   : step,
+			"names"  : list(names),
+		}
 
-		x, y, vals = rrdtool.graph("/dev/null", *args)
-		return dict(zip(self.rrd_schema_names, vals))
+		# Return all data if no downsampling was requested
+		if not points or len(values) <= points:
+			ret["series"] = {
+				name : series.pack(values[:, i]) for i, name in enumerate(names)
+			}
+
+		# Select the points that preserve the shape of each series
+		elif method == "lttb":
+			# rrdtool labels each row with the end of its step
+			timestamps = start + step * numpy.arange(1, len(values) + 1, dtype=numpy.float64)
+
+			ret.update({
+				"series"     : {},
+				"timestamps" : {},
+			})
+
+			for i, name in enumerate(names):
+				selected = series.lttb(timestamps, values[:, i], int(points))
+
+				ret["series"][name] = series.pack(values[selected, i])
+				ret["timestamps"][name] = series.pack(timestamps[selected])
+
+		# Return the envelope of each bucket
+		elif method == "minmax":
+			size, average, minimum, maximum = series.minmax(values, int(points))
+
+			ret.update({
+				"step"    : step * size,
+				"series"  : {
+					name : series.pack(average[:, i]) for i, name in enumerate(names)
+				},
+				"minimum" : {
+					name : series.pack(minimum[:, i]) for i, name in enumerate(names)
+				},
+				"maximum" : {
+					name : series.pack(maximum[:, i]) for i, name in enumerate(names)
+				},
+			})
+
+		else:
+			raise ValueError("Unsupported downsampling method: %s" % method)
+
+		return ret
 
 	def commit(self):
 		"""
@@ -436,7 +1004,9 @@ class Object(object):
 		self.create()
 
 		# Write everything to disk that is in the write queue
-		self.collecty.write_queue.commit_file(self.file)
+		# unless there is nothing pending for this database
+		if self.collecty.write_queue.has_pending(self.file):
+			self.collecty.write_queue.commit_file(self.file)
 
 	# Convenience functions for plugin authors
 
@@ -444,9 +1014,7 @@ class Object(object):
 		"""
 			Reads the content of the given file
 		"""
-		filename = os.path.join(*args)
-
-		with open(filename) as f:
+		with util.open_file(*args) as f:
 			value = f.read()
 
 		# Strip any excess whitespace
@@ -472,7 +1040,7 @@ class Object(object):
 		"""
 		ret = {}
 
-		with open("/proc/stat") as f:
+		with util.open_file("/proc/stat") as f:
 			for line in f:
 				# Split the key from the rest of the line
 				key, line = line.split(" ", 1)
@@ -485,7 +1053,7 @@ class Object(object):
 	def read_proc_meminfo(self):
 		ret = {}
 
-		with open("/proc/meminfo") as f:
+		with util.open_file("/proc/meminfo") as f:
 			for line in f:
 				# Split the key from the rest of the line
 				key, line = line.split(":", 1)
@@ -528,6 +1096,13 @@ class GraphTemplate(object):
 	# Extra arguments passed to rrdgraph.
 	rrd_graph_args = []
 
+	# All compiled command lines of all templates
+	_command_lines = collections.OrderedDict()
+	_command_lines_lock = threading.Lock()
+
+	# The maximum number of compiled command lines that are kept
+	COMMAND_LINE_CACHE_SIZE = 256
+
 	def __init__(self, plugin, object_id, locale=None, timezone=None):
 		self.plugin = plugin
 
@@ -561,8 +1136,7 @@ class GraphTemplate(object):
 		if len(self.objects) == 1:
 			return self.objects[0]
 
-	def _make_command_line(self, interval, format=DEFAULT_IMAGE_FORMAT,
-			width=None, height=None, with_title=True, thumbnail=False):
+	def _make_command_line(self, with_title=True, thumbnail=False):
 		args = [
 			# Change the background colour
 			"--color", "BACK#FFFFFFFF",
@@ -583,21 +1157,10 @@ class GraphTemplate(object):
 			"--watermark", _("Created by collecty"),
 		]
 
-		# Set the default dimensions
-		default_width, default_height = 960, 480
-
 		# A thumbnail doesn't have a legend and other labels
 		if thumbnail:
 			args.append("--only-graph")
 
-			default_width, default_height = 80, 20
-
-		args += [
-			"--imgformat", format,
-			"--height", "%s" % (height or default_height),
-			"--width", "%s" % (width or default_width),
-		]
-
 		args += self.rrd_graph_args
 
 		# Graph title
@@ -618,11 +1181,59 @@ class GraphTemplate(object):
 			if self.upper_limit is not None:
 				args += ["--upper-limit", self.upper_limit]
 
-		# Add interval
-		args += ["--start", util.make_interval(interval)]
-
 		return args
 
+	def _make_graph(self):
+		rrd_graph = self.rrd_graph
+
+		args = []
+
+		# Add DEFs for all objects
+		if not any((e.startswith("DEF:") for e in rrd_graph)):
+			args += self._add_defs()
+
+		args += rrd_graph
+
+		return self._add_vdefs(args)
+
+	def compile(self, with_title=True, thumbnail=False):
+		"""
+			Returns all options and graph elements which do not change
+			between requests as tuples of strings.
+
+			They are computed only once for each template, locale
+			and set of objects.
+		"""
+		key = (
+			self.__class__,
+			self.locale or DEFAULT_LOCALE,
+			tuple(o.file for o in self.objects),
+			with_title,
+			thumbnail,
+		)
+
+		with self._command_lines_lock:
+			try:
+				self._command_lines.move_to_end(key)
+
+				return self._command_lines[key]
+			except KeyError:
+				pass
+
+		command_line = (
+			tuple(str(e) for e in self._make_command_line(with_title=with_title, thumbnail=thumbnail)),
+			tuple(str(e) for e in self._make_graph()),
+		)
+
+		with self._command_lines_lock:
+			self._command_lines[key] = command_line
+
+			# Drop the least recently used command lines
+			while len(self._command_lines) > self.COMMAND_LINE_CACHE_SIZE:
+				self._command_lines.popitem(last=False)
+
+		return command_line
+
 	def _add_defs(self):
 		use_prefix = len(self.objects) >= 2
 
@@ -664,32 +1275,38 @@ class GraphTemplate(object):
 
 		return []
 
-	def generate_graph(self, interval=None, **kwargs):
+	def generate_graph(self, interval=None, format=DEFAULT_IMAGE_FORMAT,
+			width=None, height=None, with_title=True, thumbnail=False, flush=True):
 		assert self.objects, "Cannot render graph without any objects"
 
 		# Make sure that all collected data is in the database
 		# to get a recent graph image
-		for object in self.objects:
-			object.commit()
+		if flush:
+			for object in self.objects:
+				object.commit()
 
-		args = self._make_command_line(interval, **kwargs)
+		options, rrd_graph = self.compile(with_title=with_title, thumbnail=thumbnail)
 
 		self.log.info(_("Generating graph %s") % self)
 
-		rrd_graph = self.rrd_graph
-
-		# Add DEFs for all objects
-		if not any((e.startswith("DEF:") for e in rrd_graph)):
-			args += self._add_defs()
+		# Set the default dimensions
+		if thumbnail:
+			default_width, default_height = 80, 20
+		else:
+			default_width, default_height = 960, 480
 
-		args += rrd_graph
-		args = self._add_vdefs(args)
+		args = options + (
+			"--imgformat", format,
+			"--height", "%s" % (height or default_height),
+			"--width", "%s" % (width or default_width),
 
-		# Convert arguments to string
-		args = [str(e) for e in args]
+			# Add interval
+			"--start", util.make_interval(interval),
+		) + rrd_graph
 
-		for arg in args:
-			self.log.debug("  %s" % arg)
+		if self.log.isEnabledFor(logging.DEBUG):
+			for arg in args:
+				self.log.debug("  %s" % arg)
 
 		graph = rrdtool.graphv("-", *args)
 
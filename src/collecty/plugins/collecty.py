@@ -0,0 +1,699 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import numpy
+import os
+import threading
+
+from .. import util
+from . import base
+
+from ..colours import *
+from ..constants import *
+from ..i18n import _
+
+def percentiles(values):
+	"""
+		Returns the median, the 95th percentile and the maximum of values
+	"""
+	if not values:
+		return None, None, None
+
+	p50, p95, max = numpy.percentile(values, (50, 95, 100))
+
+	return p50, p95, max
+
+class GraphTemplateCollectyPlugin(base.GraphTemplate):
+	name = "collecty-plugin"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			# Convert everything into milliseconds
+			"CDEF:duration_ms=duration,1000,*",
+			"CDEF:duration_max_ms=duration_max,1000,*",
+
+			"AREA:duration_ms%s:%s" % (
+				transparency(PRIMARY, AREA_OPACITY),
+				LABEL % _("Collection Time"),
+			),
+			"GPRINT:duration_ms_cur:%s" % MS,
+			"GPRINT:duration_ms_avg:%s" % MS,
+			"GPRINT:duration_ms_min:%s" % MS,
+			"GPRINT:duration_ms_max:%s\\j" % MS,
+
+			"LINE1:duration_max_ms%s:%s" % (
+				ACCENT,
+				LABEL % _("Longest Collection"),
+			),
+			"GPRINT:duration_max_ms_cur:%s" % MS,
+			"GPRINT:duration_max_ms_avg:%s" % MS,
+			"GPRINT:duration_max_ms_min:%s" % MS,
+			"GPRINT:duration_max_ms_max:%s\\j" % MS,
+
+			"COMMENT:%s" % (LABEL % _("Overruns")),
+			"GPRINT:overruns_cur:%s" % INTEGER,
+			"GPRINT:overruns_avg:%s" % FLOAT,
+			"GPRINT:overruns_min:%s" % INTEGER,
+			"GPRINT:overruns_max:%s\\j" % INTEGER,
+
+			"LINE1:duration_ms%s" % PRIMARY,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Collection Time of %s") % self.object.name
+
+	@property
+	def graph_vertical_label(self):
+		return _("Milliseconds")
+
+
+class GraphTemplateCollectyPluginCPU(base.GraphTemplate):
+	name = "collecty-plugin-cpu"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			# CPU time is stored in milliseconds per second
+			"CDEF:cpu_p=cpu,10,/",
+
+			"AREA:cpu_p%s:%s" % (
+				transparency(PRIMARY, AREA_OPACITY),
+				LABEL % _("CPU Usage"),
+			),
+			"GPRINT:cpu_p_cur:%s" % PERCENTAGE,
+			"GPRINT:cpu_p_avg:%s" % PERCENTAGE,
+			"GPRINT:cpu_p_min:%s" % PERCENTAGE,
+			"GPRINT:cpu_p_max:%s\\j" % PERCENTAGE,
+
+			"LINE1:cpu_p%s" % PRIMARY,
+		]
+
+	@property
+	def graph_title(self):
+		return _("CPU Usage of %s") % self.object.name
+
+	@property
+	def graph_vertical_label(self):
+		return _("Percent")
+
+
+class GraphTemplateCollectyBackoff(base.GraphTemplate):
+	name = "collecty-backoff"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			"AREA:skipped%s:%s" % (
+				transparency(ACCENT, AREA_OPACITY),
+				LABEL % _("Skipped Collections"),
+			),
+			"GPRINT:skipped_cur:%s" % INTEGER,
+			"GPRINT:skipped_avg:%s" % FLOAT,
+			"GPRINT:skipped_min:%s" % INTEGER,
+			"GPRINT:skipped_max:%s\\j" % INTEGER,
+
+			"LINE2:backoff%s:%s" % (
+				PRIMARY,
+				LABEL % _("Back-off"),
+			),
+			"GPRINT:backoff_cur:%s" % INTEGER,
+			"GPRINT:backoff_avg:%s" % FLOAT,
+			"GPRINT:backoff_min:%s" % INTEGER,
+			"GPRINT:backoff_max:%s\\j" % INTEGER,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Back-off of %s") % self.object.name
+
+	@property
+	def graph_vertical_label(self):
+		return _("Ticks")
+
+
+class GraphTemplateCollectyTimeouts(base.GraphTemplate):
+	name = "collecty-timeouts"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			"AREA:quarantined%s:%s" % (
+				transparency(ACCENT, AREA_OPACITY),
+				LABEL % _("Quarantined Objects"),
+			),
+			"GPRINT:quarantined_cur:%s" % INTEGER,
+			"GPRINT:quarantined_avg:%s" % FLOAT,
+			"GPRINT:quarantined_min:%s" % INTEGER,
+			"GPRINT:quarantined_max:%s\\j" % INTEGER,
+
+			"LINE2:timeouts%s:%s" % (
+				PRIMARY,
+				LABEL % _("Timeouts"),
+			),
+			"GPRINT:timeouts_cur:%s" % INTEGER,
+			"GPRINT:timeouts_avg:%s" % FLOAT,
+			"GPRINT:timeouts_min:%s" % INTEGER,
+			"GPRINT:timeouts_max:%s\\j" % INTEGER,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Timeouts of %s") % self.object.name
+
+	@property
+	def graph_vertical_label(self):
+		return _("Objects")
+
+
+class GraphTemplateCollectyQueue(base.GraphTemplate):
+	name = "collecty-queue"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			"AREA:bytes%s:%s" % (
+				transparency(PRIMARY, AREA_OPACITY),
+				LABEL % _("Queued Data"),
+			),
+			"GPRINT:bytes_cur:%s" % LARGE_FLOAT,
+			"GPRINT:bytes_avg:%s" % LARGE_FLOAT,
+			"GPRINT:bytes_min:%s" % LARGE_FLOAT,
+			"GPRINT:bytes_max:%s\\j" % LARGE_FLOAT,
+
+			"COMMENT:%s" % (LABEL % _("Queued Samples")),
+			"GPRINT:length_cur:%s" % INTEGER,
+			"GPRINT:length_avg:%s" % INTEGER,
+			"GPRINT:length_min:%s" % INTEGER,
+			"GPRINT:length_max:%s\\j" % INTEGER,
+
+			"LINE1:bytes%s" % PRIMARY,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Write Queue")
+
+	@property
+	def graph_vertical_label(self):
+		return _("Bytes")
+
+
+class GraphTemplateCollectyCommit(base.GraphTemplate):
+	name = "collecty-commit"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			"CDEF:commit_duration_ms=commit_duration,1000,*",
+
+			"AREA:commit_duration_ms%s:%s" % (
+				transparency(PRIMARY, AREA_OPACITY),
+				LABEL % _("Commit Time"),
+			),
+			"GPRINT:commit_duration_ms_cur:%s" % MS,
+			"GPRINT:commit_duration_ms_avg:%s" % MS,
+			"GPRINT:commit_duration_ms_min:%s" % MS,
+			"GPRINT:commit_duration_ms_max:%s\\j" % MS,
+
+			"COMMENT:%s" % (LABEL % _("Files Written")),
+			"GPRINT:files_cur:%s" % INTEGER,
+			"GPRINT:files_avg:%s" % INTEGER,
+			"GPRINT:files_min:%s" % INTEGER,
+			"GPRINT:files_max:%s\\j" % INTEGER,
+
+			"LINE1:commit_duration_ms%s" % PRIMARY,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Commit Time")
+
+	@property
+	def graph_vertical_label(self):
+		return _("Milliseconds")
+
+
+class GraphTemplateCollectyLatency(base.GraphTemplate):
+	name = "collecty-render"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			# Convert everything into milliseconds
+			"CDEF:p50_ms=p50,1000,*",
+			"CDEF:p95_ms=p95,1000,*",
+			"CDEF:max_ms=max,1000,*",
+
+			"AREA:p95_ms%s:%s" % (
+				transparency(PRIMARY, AREA_OPACITY),
+				LABEL % _("95th Percentile"),
+			),
+			"GPRINT:p95_ms_cur:%s" % MS,
+			"GPRINT:p95_ms_avg:%s" % MS,
+			"GPRINT:p95_ms_min:%s" % MS,
+			"GPRINT:p95_ms_max:%s\\j" % MS,
+
+			"LINE2:p50_ms%s:%s" % (
+				PRIMARY,
+				LABEL % _("Median"),
+			),
+			"GPRINT:p50_ms_cur:%s" % MS,
+			"GPRINT:p50_ms_avg:%s" % MS,
+			"GPRINT:p50_ms_min:%s" % MS,
+			"GPRINT:p50_ms_max:%s\\j" % MS,
+
+			"LINE1:max_ms%s:%s" % (
+				ACCENT,
+				LABEL % _("Maximum"),
+			),
+			"GPRINT:max_ms_cur:%s" % MS,
+			"GPRINT:max_ms_avg:%s" % MS,
+			"GPRINT:max_ms_min:%s" % MS,
+			"GPRINT:max_ms_max:%s\\j" % MS,
+
+			EMPTY_LINE,
+
+			"COMMENT:%s" % (LABEL % _("Requests")),
+			"GPRINT:count_cur:%s" % INTEGER,
+			"GPRINT:count_avg:%s" % FLOAT,
+			"GPRINT:count_min:%s" % INTEGER,
+			"GPRINT:count_max:%s\\j" % INTEGER,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Graph Rendering Time")
+
+	@property
+	def graph_vertical_label(self):
+		return _("Milliseconds")
+
+
+class GraphTemplateCollectyBus(GraphTemplateCollectyLatency):
+	name = "collecty-bus"
+
+	@property
+	def graph_title(self):
+		return _("Latency of %s") % self.object.method
+
+
+class GraphTemplateCollectyLateness(GraphTemplateCollectyLatency):
+	name = "collecty-lateness"
+
+	@property
+	def graph_title(self):
+		return _("Scheduling Lateness")
+
+
+class GraphTemplateCollectyProcess(base.GraphTemplate):
+	name = "collecty-process"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			"AREA:rss%s:%s" % (
+				transparency(PRIMARY, AREA_OPACITY),
+				LABEL % _("Resident Memory"),
+			),
+			"GPRINT:rss_cur:%s" % LARGE_FLOAT,
+			"GPRINT:rss_avg:%s" % LARGE_FLOAT,
+			"GPRINT:rss_min:%s" % LARGE_FLOAT,
+			"GPRINT:rss_max:%s\\j" % LARGE_FLOAT,
+
+			"COMMENT:%s" % (LABEL % _("Threads")),
+			"GPRINT:threads_cur:%s" % INTEGER,
+			"GPRINT:threads_avg:%s" % INTEGER,
+			"GPRINT:threads_min:%s" % INTEGER,
+			"GPRINT:threads_max:%s\\j" % INTEGER,
+
+			"LINE1:rss%s" % PRIMARY,
+		]
+
+	@property
+	def graph_title(self):
+		return _("Memory Usage of collecty")
+
+	@property
+	def graph_vertical_label(self):
+		return _("Bytes")
+
+
+class GraphTemplateCollectyProcessCPU(base.GraphTemplate):
+	name = "collecty-process-cpu"
+
+	lower_limit = 0
+
+	@property
+	def rrd_graph(self):
+		return [
+			# Headline
+			"COMMENT:%s" % EMPTY_LABEL,
+			"COMMENT:%s" % (COLUMN % _("Current")),
+			"COMMENT:%s" % (COLUMN % _("Average")),
+			"COMMENT:%s" % (COLUMN % _("Minimum")),
+			"COMMENT:%s\\j" % (COLUMN % _("Maximum")),
+
+			# CPU time is stored in milliseconds per second
+			"CDEF:user_p=cpu_user,10,/",
+			"CDEF:system_p=cpu_system,10,/",
+
+			"AREA:user_p%s:%s" % (
+				transparency(CPU_USER, AREA_OPACITY),
+				LABEL % _("User"),
+			),
+			"GPRINT:user_p_cur:%s" % PERCENTAGE,
+			"GPRINT:user_p_avg:%s" % PERCENTAGE,
+			"GPRINT:user_p_min:%s" % PERCENTAGE,
+			"GPRINT:user_p_max:%s\\j" % PERCENTAGE,
+
+			"AREA:system_p%s:%s:STACK" % (
+				transparency(CPU_SYS, AREA_OPACITY),
+				LABEL % _("System"),
+			),
+			"GPRINT:system_p_cur:%s" % PERCENTAGE,
+			"GPRINT:system_p_avg:%s" % PERCENTAGE,
+			"GPRINT:system_p_min:%s" % PERCENTAGE,
+			"GPRINT:system_p_max:%s\\j" % PERCENTAGE,
+		]
+
+	@property
+	def graph_title(self):
+		return _("CPU Usage of collecty")
+
+	@property
+	def graph_vertical_label(self):
+		return _("Percent")
+
+
+class CollectyPluginObject(base.Object):
+	rrd_schema = [
+		"DS:duration:GAUGE:0:U",
+		"DS:duration_max:GAUGE:0:U",
+		"DS:cpu:DERIVE:0:U",
+		"DS:overruns:GAUGE:0:U",
+	]
+
+	def init(self, name):
+		self.name = name
+
+		# The CPU time used by this plugin since the daemon was started
+		self.cpu = 0
+
+	@property
+	def id(self):
+		return "plugin-%s" % self.name
+
+	def collect(self):
+		stats = self.collecty.stats
+
+		durations = stats.pop("collect/%s" % self.name)
+		overruns  = stats.pop("overruns/%s" % self.name)
+
+		# Sum up the used CPU time
+		self.cpu += sum(stats.pop("cpu/%s" % self.name))
+
+		return (
+			numpy.mean(durations) if durations else None,
+			max(durations) if durations else None,
+			round(self.cpu * 1000),
+			len(overruns),
+		)
+
+
+class CollectyBackoffObject(base.Object):
+	rrd_schema = [
+		"DS:backoff:GAUGE:1:U",
+		"DS:skipped:GAUGE:0:U",
+	]
+
+	def init(self, name):
+		self.name = name
+
+	@property
+	def id(self):
+		return "backoff-%s" % self.name
+
+	def collect(self):
+		stats = self.collecty.stats
+
+		backoff = stats.pop("backoff/%s" % self.name)
+		skipped = stats.pop("skipped/%s" % self.name)
+
+		return (
+			max(backoff) if backoff else None,
+			len(skipped),
+		)
+
+
+class CollectyTimeoutsObject(base.Object):
+	rrd_schema = [
+		"DS:timeouts:GAUGE:0:U",
+		"DS:quarantined:GAUGE:0:U",
+	]
+
+	def init(self, name):
+		self.name = name
+
+	@property
+	def id(self):
+		return "timeouts-%s" % self.name
+
+	def collect(self):
+		stats = self.collecty.stats
+
+		timeouts    = stats.pop("timeouts/%s" % self.name)
+		quarantined = stats.pop("quarantined/%s" % self.name)
+
+		return (
+			len(timeouts),
+			max(quarantined) if quarantined else 0,
+		)
+
+
+class CollectyQueueObject(base.Object):
+	rrd_schema = [
+		"DS:length:GAUGE:0:U",
+		"DS:bytes:GAUGE:0:U",
+		"DS:commit_duration:GAUGE:0:U",
+		"DS:files:GAUGE:0:U",
+	]
+
+	def init(self):
+		# The last commit happens less often than we collect
+		self.commit_duration, self.files = None, None
+
+	@property
+	def id(self):
+		return "queue"
+
+	def collect(self):
+		stats = self.collecty.stats
+
+		length, bytes = self.collecty.write_queue.size()
+
+		# Use the last commit
+		for duration in stats.pop("commit/duration"):
+			self.commit_duration = duration
+
+		for files in stats.pop("commit/files"):
+			self.files = files
+
+		return (
+			length,
+			bytes,
+			self.commit_duration,
+			self.files,
+		)
+
+
+class CollectyLatencyObject(base.Object):
+	rrd_schema = [
+		"DS:count:GAUGE:0:U",
+		"DS:p50:GAUGE:0:U",
+		"DS:p95:GAUGE:0:U",
+		"DS:max:GAUGE:0:U",
+	]
+
+	def init(self, key):
+		self.key = key
+
+	@property
+	def id(self):
+		return self.key.replace("/", "-")
+
+	@property
+	def method(self):
+		return self.key.partition("/")[2]
+
+	def collect(self):
+		values = self.collecty.stats.pop(self.key)
+
+		return (len(values),) + percentiles(values)
+
+
+class CollectyProcessObject(base.Object):
+	rrd_schema = [
+		"DS:rss:GAUGE:0:U",
+		"DS:threads:GAUGE:0:U",
+		"DS:cpu_user:DERIVE:0:U",
+		"DS:cpu_system:DERIVE:0:U",
+	]
+
+	@property
+	def id(self):
+		return "process"
+
+	def collect(self):
+		times = os.times()
+
+		return (
+			self.get_rss(),
+			threading.active_count(),
+			round(times.user * 1000),
+			round(times.system * 1000),
+		)
+
+	def get_rss(self):
+		"""
+			Returns the resident set size of this process in bytes
+		"""
+		with util.open_file("/proc/self/statm") as f:
+			pages = f.read().split()[1]
+
+		return int(pages) * os.sysconf("SC_PAGE_SIZE")
+
+
+class CollectyPlugin(base.Plugin):
+	name = "collecty"
+	description = "Collecty Self-Monitoring Plugin"
+
+	# All objects read the statistics of the daemon
+	in_process = True
+
+	templates = [
+		GraphTemplateCollectyPlugin,
+		GraphTemplateCollectyPluginCPU,
+		GraphTemplateCollectyBackoff,
+		GraphTemplateCollectyTimeouts,
+		GraphTemplateCollectyQueue,
+		GraphTemplateCollectyCommit,
+		GraphTemplateCollectyLatency,
+		GraphTemplateCollectyBus,
+		GraphTemplateCollectyLateness,
+		GraphTemplateCollectyProcess,
+		GraphTemplateCollectyProcessCPU,
+	]
+
+	@property
+	def objects(self):
+		for plugin in self.collecty.plugins:
+			yield CollectyPluginObject(self, plugin.name)
+			yield CollectyBackoffObject(self, plugin.name)
+
+		yield CollectyQueueObject(self)
+		yield CollectyLatencyObject(self, "render")
+
+		# How late collections have started
+		yield CollectyLatencyObject(self, "lateness")
+
+		# Add an object for each plugin that has had any timeouts
+		for key in self.collecty.stats.keys("timeouts/"):
+			yield CollectyTimeoutsObject(self, key.partition("/")[2])
+
+		# Add an object for each bus method that has been called
+		for key in self.collecty.stats.keys("bus/"):
+			yield CollectyLatencyObject(self, key)
+
+		yield CollectyProcessObject(self)
@@ -21,6 +21,7 @@
 
 import re
 
+from .. import util
 from . import base
 
 from ..colours import *
@@ -74,7 +75,7 @@ class ContextSwitchesObject(base.Object):
 	def collect(self):
 		expr = r"^ctxt (\d+)$"
 
-		with open("/proc/stat") as f:
+		with util.open_file("/proc/stat") as f:
 			for line in f.readlines():
 				m = re.match(expr, line)
 				if m:
@@ -22,6 +22,7 @@
 import os
 import re
 
+from .. import util
 from . import base
 
 class GraphTemplateCPUFreq(base.GraphTemplate):
@@ -30,7 +31,7 @@ class GraphTemplateCPUFreq(base.GraphTemplate):
 	lower_limit = 0
 
 	def get_objects(self, *args, **kwargs):
-		return list(self.plugin.objects)
+		return self.plugin.get_objects()
 
 	@property
 	def graph_title(self):
@@ -92,9 +93,7 @@ class CPUFreqObject(base.Object):
 		return self.read_file(self.sys_path, "topology/core_id")
 
 	def is_cpufreq_supported(self):
-		path = os.path.join(self.sys_path, "cpufreq")
-
-		return os.path.exists(path)
+		return util.exists(self.sys_path, "cpufreq")
 
 	def collect(self):
 		return (
@@ -120,7 +119,7 @@ class CPUFreqPlugin(base.Plugin):
 	def objects(self):
 		core_ids = []
 
-		for cpuid in os.listdir("/sys/devices/system/cpu"):
+		for cpuid in util.listdir("/sys/devices/system/cpu"):
 			if not re.match(r"cpu[0-9]+", cpuid):
 				continue
 
@@ -136,6 +136,9 @@ class DiskUsageObject(base.Object):
 		"DS:inodes_free:GAUGE:0:U",
 	]
 
+	# statvfs() blocks forever on a dead network file system
+	timeout = 10
+
 	def __repr__(self):
 		return "<%s %s>" % (self.__class__.__name__, self.mountpoint)
 
@@ -23,6 +23,7 @@ import os
 import re
 
 from .. import _collecty
+from .. import util
 from . import base
 
 from ..colours import *
@@ -174,6 +175,9 @@ class DiskObject(base.Object):
 		"DS:temperature:GAUGE:U:U",
 	]
 
+	# SMART commands can hang on a failing disk
+	timeout = 10
+
 	def __repr__(self):
 		return "<%s %s (%s)>" % (self.__class__.__name__, self.sys_path, self.id)
 
@@ -222,9 +226,7 @@ class DiskObject(base.Object):
 			io_ticks        milliseconds  total time this block device has been active
 			time_in_queue   milliseconds  total wait time for all requests
 		"""
-		stats_file = os.path.join(self.sys_path, "stat")
-
-		with open(stats_file) as f:
+		with util.open_file(self.sys_path, "stat") as f:
 			stats = f.read().split()
 
 			return {
@@ -291,6 +293,12 @@ class DiskPlugin(base.Plugin):
 		r"mmcblk[0-9]+",
 	]
 
+	def configure(self, config):
+		base.Plugin.configure(self, config)
+
+		self.block_device_patterns = config.getlist("patterns",
+			fallback=DiskPlugin.block_device_patterns)
+
 	@property
 	def objects(self):
 		for dev in self.find_block_devices():
@@ -300,7 +308,7 @@ class DiskPlugin(base.Plugin):
 				pass
 
 	def find_block_devices(self):
-		for device in os.listdir("/sys/block"):
+		for device in util.listdir("/sys/block"):
 			# Skip invalid device names
 			if not self._valid_block_device_name(device):
 				continue
@@ -256,7 +256,7 @@ class InterfaceObject(base.Object):
 		interface_path = os.path.join("/sys/class/net", self.interface)
 
 		# Check if the interface exists.
-		if not os.path.exists(interface_path):
+		if not util.exists(interface_path):
 			self.log.debug(_("Interface %s does not exists. Cannot collect.") \
 				% self.interface)
 			return
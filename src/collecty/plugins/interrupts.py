@@ -19,9 +19,9 @@
 #                                                                             #
 ###############################################################################
 
-import os
 import re
 
+from .. import util
 from . import base
 
 from ..colours import *
@@ -107,7 +107,7 @@ class InterruptsPlugin(base.Plugin):
 	def objects(self):
 		yield InterruptObject(self)
 
-		for irq in os.listdir("/sys/kernel/irq"):
+		for irq in util.listdir("/sys/kernel/irq"):
 			try:
 				irq = int(irq)
 			except (ValueError, TypeError):
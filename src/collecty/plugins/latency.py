@@ -196,7 +196,15 @@ class LatencyPlugin(base.Plugin):
 	# Because this plugin has the potential to block, we give it a slightly lower priority
 	priority = 10
 
+	def init(self):
+		self.hosts = PING_HOSTS
+
+	def configure(self, config):
+		base.Plugin.configure(self, config)
+
+		self.hosts = config.getlist("hosts", fallback=PING_HOSTS)
+
 	@property
 	def objects(self):
-		for hostname in PING_HOSTS:
+		for hostname in self.hosts:
 			yield LatencyObject(self, hostname)
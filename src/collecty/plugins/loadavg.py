@@ -19,8 +19,7 @@
 #                                                                             #
 ###############################################################################
 
-import os
-
+from .. import util
 from . import base
 
 from ..colours import *
@@ -96,7 +95,8 @@ class LoadAvgObject(base.Object):
 		return "default"
 
 	def collect(self):
-		return os.getloadavg()
+		with util.open_file("/proc/loadavg") as f:
+			return f.read().split()[:3]
 
 
 class LoadAvgPlugin(base.Plugin):
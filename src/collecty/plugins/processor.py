@@ -19,8 +19,9 @@
 #                                                                             #
 ###############################################################################
 
-import multiprocessing
+import re
 
+from .. import util
 from . import base
 
 from ..colours import *
@@ -226,6 +227,9 @@ class ProcessorPlugin(base.Plugin):
 	def objects(self):
 		yield ProcessorObject(self)
 
-		num = multiprocessing.cpu_count()
-		for i in range(num):
-			yield ProcessorObject(self, cpu_id=i)
+		# Add all processors that are listed in /proc/stat
+		with util.open_file("/proc/stat") as f:
+			for line in f:
+				m = re.match(r"^cpu(\d+) ", line)
+				if m:
+					yield ProcessorObject(self, cpu_id=int(m.group(1)))
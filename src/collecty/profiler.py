@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import cProfile
+import collections
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+
+from .i18n import _
+
+log = logging.getLogger("collecty.profiler")
+
+PROFILER_MODES = ("cpu", "memory", "sample")
+
+class Profiler(object):
+	"""
+		Profiles the daemon for a number of collections and/or
+		graph renders, writes the result to a file and stops
+
+		cpu:    Runs cProfile around each collection and render.
+		        The result can be read with the pstats module.
+		memory: Traces all memory allocations with tracemalloc and
+		        dumps a snapshot that can be loaded with
+		        tracemalloc.Snapshot.load().
+		sample: Samples the stacks of all threads at a regular interval
+		        and writes them in the folded format of flame graphs.
+	"""
+	def __init__(self, filename, mode="cpu", collections=0, renders=0,
+			interval=0.01, callback=None):
+		if not mode in PROFILER_MODES:
+			raise ValueError(_("Unsupported profiler mode: %s") % mode)
+
+		if not collections and not renders:
+			raise ValueError(_("Nothing to profile"))
+
+		self.filename = filename
+		self.mode = mode
+
+		# The number of collections and renders that are still to be profiled
+		self.remaining = {
+			"collect" : collections,
+			"render"  : renders,
+		}
+
+		# The sampling interval in seconds
+		self.interval = interval
+
+		# Called when the profiler has finished
+		self.callback = callback
+
+		self._active = 0
+		self._finished = False
+		self._lock = threading.Lock()
+
+		# cProfile cannot be used by more than one thread at a time
+		self._profile = None
+		self._profile_lock = threading.Lock()
+
+		# Sampler
+		self._samples = None
+		self._sampler = None
+		self._stopped = threading.Event()
+
+	def start(self):
+		log.info(_("Starting %s profiler") % self.mode)
+
+		if self.mode == "cpu":
+			self._profile = cProfile.Profile()
+
+		elif self.mode == "memory":
+			tracemalloc.start(25)
+
+		elif self.mode == "sample":
+			self._samples = collections.Counter()
+
+			self._sampler = threading.Thread(target=self._sample, daemon=True)
+			self._sampler.start()
+
+	def run(self, kind, func, *args, **kwargs):
+		"""
+			Calls func and profiles it if there are still
+			any calls of this kind to be profiled
+		"""
+		with self._lock:
+			if self._finished or not self.remaining.get(kind):
+				return func(*args, **kwargs)
+
+			self.remaining[kind] -= 1
+			self._active += 1
+
+		try:
+			if self._profile:
+				with self._profile_lock:
+					return self._profile.runcall(func, *args, **kwargs)
+
+			return func(*args, **kwargs)
+
+		finally:
+			with self._lock:
+				self._active -= 1
+
+				# Finish when everything has been profiled
+				finished = not self._active and not any(self.remaining.values())
+
+			if finished:
+				self.stop()
+
+	def stop(self):
+		"""
+			Stops profiling and writes the result
+		"""
+		with self._lock:
+			if self._finished:
+				return
+
+			self._finished = True
+
+		# Stop sampling
+		if self._sampler:
+			self._stopped.set()
+			self._sampler.join()
+
+		try:
+			self._write()
+
+		# Don't leave a partial file behind
+		except Exception as e:
+			log.error(_("Could not write profile to %s: %s") % (self.filename, e))
+
+			try:
+				os.unlink(self.filename)
+			except OSError:
+				pass
+
+		else:
+			log.info(_("Profile has been written to %s") % self.filename)
+
+		# Always let the daemon know so that it can start another profiler
+		finally:
+			if self.callback:
+				self.callback(self)
+
+	def _write(self):
+		if self.mode == "cpu":
+			with self._profile_lock:
+				self._profile.dump_stats(self.filename)
+
+		elif self.mode == "memory":
+			snapshot = tracemalloc.take_snapshot()
+			tracemalloc.stop()
+
+			snapshot.dump(self.filename)
+
+			# Log the biggest allocations straight away
+			for stat in snapshot.statistics("lineno")[:10]:
+				log.info("  %s" % stat)
+
+		elif self.mode == "sample":
+			with open(self.filename, "w") as f:
+				for stack, count in self._samples.most_common():
+					f.write("%s %s\n" % (stack, count))
+
+	def _sample(self):
+		"""
+			Records the stacks of all other threads until stopped
+		"""
+		ident = threading.get_ident()
+
+		while not self._stopped.wait(self.interval):
+			for thread_id, frame in sys._current_frames().items():
+				if thread_id == ident:
+					continue
+
+				stack = []
+
+				while frame:
+					code = frame.f_code
+					stack.append("%s (%s:%s)" % (code.co_name, code.co_filename, code.co_firstlineno))
+
+					frame = frame.f_back
+
+				# Folded stacks start at the outermost frame
+				self._samples[";".join(reversed(stack))] += 1
@@ -0,0 +1,200 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import collections
+import contextlib
+import errno
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+from . import util
+from .i18n import _
+
+log = logging.getLogger("collecty.recording")
+
+def load(filename):
+	"""
+		Returns all frames in a recording
+
+		A recording that has not been closed properly ends
+		in the middle of a frame which is ignored.
+	"""
+	with gzip.open(filename, "rt") as f:
+		try:
+			for line in f:
+				# Skip anything incomplete
+				if not line.endswith("\n"):
+					break
+
+				yield json.loads(line)
+
+		except EOFError:
+			log.warning(_("Recording %s has not been closed properly") % filename)
+
+
+class Recorder(object):
+	"""
+		Records everything that each plugin reads from procfs and sysfs
+		while collecting data and appends it to a file (one frame of
+		compressed JSON per collection)
+
+		Anything that is read through the C extension (sensors, disks,
+		mountpoints and pings) or directly from the kernel is not recorded.
+	"""
+	def __init__(self, filename):
+		self.filename = filename
+
+		self.file = gzip.open(self.filename, "at")
+
+		# The frame that is recorded by the current thread
+		self._local = threading.local()
+		self._lock = threading.Lock()
+
+		log.info(_("Recording all reads to %s") % self.filename)
+
+	def close(self):
+		with self._lock:
+			self.file.close()
+
+	@contextlib.contextmanager
+	def frame(self, plugin):
+		"""
+			Records all reads of plugin in the block
+		"""
+		frame = {
+			"plugin" : plugin.name,
+			"time"   : time.time(),
+			"reads"  : [],
+		}
+
+		self._local.frame = frame
+
+		try:
+			yield frame
+
+		finally:
+			self._local.frame = None
+
+			line = json.dumps(frame, separators=(",", ":"))
+
+			with self._lock:
+				self.file.write("%s\n" % line)
+				self.file.flush()
+
+	def _record(self, op, path, result):
+		frame = getattr(self._local, "frame", None)
+
+		if frame is not None:
+			frame["reads"].append((op, path, result))
+
+	def _call(self, op, path, func):
+		try:
+			result = func(util.make_path(path))
+
+		# Errors are recorded by their number
+		except OSError as e:
+			self._record(op, path, { "errno" : e.errno })
+			raise
+
+		self._record(op, path, result)
+
+		return result
+
+	def open_file(self, path):
+		def read(path):
+			with open(path) as f:
+				return f.read()
+
+		return io.StringIO(self._call("open", path, read))
+
+	def listdir(self, path):
+		return self._call("listdir", path, os.listdir)
+
+	def exists(self, path):
+		return self._call("exists", path, os.path.exists)
+
+	def isdir(self, path):
+		return self._call("isdir", path, os.path.isdir)
+
+
+class Player(object):
+	"""
+		Answers all reads from a recorded frame
+	"""
+	def __init__(self, filename):
+		self.frames = list(load(filename))
+
+		self._reads = {}
+
+	def set_frame(self, frame):
+		"""
+			Makes all reads return what has been recorded in frame
+		"""
+		reads = {}
+
+		for op, path, result in frame["reads"]:
+			try:
+				reads[op, path].append(result)
+			except KeyError:
+				reads[op, path] = collections.deque([result])
+
+		self._reads = reads
+
+	def _get(self, op, path):
+		results = self._reads.get((op, path))
+
+		# Anything that has not been recorded does not exist
+		if not results:
+			raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+		# Return all results in order and keep repeating the last one
+		if len(results) > 1:
+			result = results.popleft()
+		else:
+			result = results[0]
+
+		if isinstance(result, dict):
+			raise OSError(result["errno"], os.strerror(result["errno"]), path)
+
+		return result
+
+	def open_file(self, path):
+		return io.StringIO(self._get("open", path))
+
+	def listdir(self, path):
+		return list(self._get("listdir", path))
+
+	def exists(self, path):
+		try:
+			return self._get("exists", path)
+		except OSError:
+			return False
+
+	def isdir(self, path):
+		try:
+			return self._get("isdir", path)
+		except OSError:
+			return False
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import logging
+import numpy
+import warnings
+
+log = logging.getLogger("collecty.series")
+
+# Supported downsampling methods
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+def make_array(rows, columns):
+	"""
+		Converts rows as returned by rrdtool into a two-dimensional
+		array of doubles with one column per data source.
+
+		Unknown values become NaN.
+	"""
+	return numpy.array(rows, dtype=numpy.float64).reshape(-1, columns)
+
+def pack(values):
+	"""
+		Packs values into a buffer of little-endian doubles
+	"""
+	return numpy.asarray(values, dtype="<f8").tobytes()
+
+def lttb(x, y, points):
+	"""
+		Downsamples the series (x, y) to the given number of points
+		using the Largest-Triangle-Three-Buckets algorithm.
+
+		Returns the indices of the selected points.
+	"""
+	n = len(y)
+
+	# Nothing to do if the series is short enough
+	if points >= n or points < 3:
+		return numpy.arange(n)
+
+	# Split everything between the first and last point into buckets
+	edges = numpy.linspace(1, n - 1, points - 1).astype(numpy.intp)
+	starts, ends = edges[:-1], edges[1:]
+
+	# Compute the average point of each bucket ignoring any unknown values
+	known = ~numpy.isnan(y[:-1])
+	counts = numpy.add.reduceat(known, starts)
+
+	with numpy.errstate(invalid="ignore", divide="ignore"):
+		avg_x = numpy.add.reduceat(x[:-1], starts) / (ends - starts)
+		avg_y = numpy.add.reduceat(numpy.where(known, y[:-1], 0), starts) / counts
+
+	# The last bucket is followed by the last point
+	avg_x = numpy.append(avg_x[1:], x[-1])
+	avg_y = numpy.append(avg_y[1:], y[-1])
+
+	selected = numpy.empty(points, dtype=numpy.intp)
+	selected[0], selected[-1] = 0, n - 1
+
+	a = 0
+
+	for i, (start, end) in enumerate(zip(starts, ends)):
+		bx, by = x[start:end], y[start:end]
+
+		# Compute the area of the triangles between the previously selected
+		# point, every point in this bucket and the average of the next bucket
+		area = numpy.abs(
+			(x[a] - avg_x[i]) * (by - y[a]) - (x[a] - bx) * (avg_y[i] - y[a])
+		)
+
+		# Unknown values can never be selected unless there is nothing else
+		area[numpy.isnan(area)] = -1
+
+		a = start + numpy.argmax(area)
+		selected[i + 1] = a
+
+	return selected
+
+def minmax(values, points):
+	"""
+		Downsamples values (one column per series) into buckets
+		of equal size so that at most the given number of points
+		is left.
+
+		Returns the bucket size and the average, minimum and
+		maximum of each bucket.
+	"""
+	n, columns = values.shape
+
+	size = max(-(-n // points), 1)
+
+	# Pad the values so that they can be split into buckets evenly
+	padding = numpy.full(((-n) % size, columns), numpy.nan)
+	buckets = numpy.concatenate((values, padding)).reshape(-1, size, columns)
+
+	# Buckets without any known values will result in NaN
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore", RuntimeWarning)
+
+		return (
+			size,
+			numpy.nanmean(buckets, axis=1),
+			numpy.nanmin(buckets, axis=1),
+			numpy.nanmax(buckets, axis=1),
+		)
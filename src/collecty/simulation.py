@@ -0,0 +1,225 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import logging
+import math
+import numpy
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+from . import daemon
+from .plugins import base
+from .i18n import _
+
+log = logging.getLogger("collecty.simulation")
+
+def generate_random(object, i):
+	return random.uniform(0, 100)
+
+def generate_counter(object, i):
+	object.counters[i] += random.randint(0, 100000)
+
+	return object.counters[i]
+
+def generate_sine(object, i):
+	# A daily wave which is shifted for each object and data source
+	x = time.time() * 2 * math.pi / 86400 + object.phase + i
+
+	return 50 + 50 * math.sin(x)
+
+def generate_constant(object, i):
+	return 1
+
+# All value generators by their name
+GENERATORS = {
+	"random"   : generate_random,
+	"counter"  : generate_counter,
+	"sine"     : generate_sine,
+	"constant" : generate_constant,
+}
+
+class SimulatedObject(base.Object):
+	def init(self, n, data_sources=4, generator="random"):
+		self.n = n
+
+		try:
+			self.generator = GENERATORS[generator]
+		except KeyError:
+			raise RuntimeError("Could not find generator %s" % generator)
+
+		# Counters are stored as DERIVE, everything else as GAUGE
+		type = "DERIVE" if generator == "counter" else "GAUGE"
+
+		self.rrd_schema = [
+			"DS:value%s:%s:0:U" % (i, type) for i in range(data_sources)
+		]
+
+		self.counters = [0] * data_sources
+		self.phase = random.uniform(0, 2 * math.pi)
+
+	@property
+	def id(self):
+		return "object%s" % self.n
+
+	def collect(self):
+		return [self.generator(self, i) for i in range(len(self.rrd_schema))]
+
+
+class SimulatedPlugin(base.Plugin):
+	"""
+		A plugin with a configurable number of synthetic objects
+	"""
+	name = "simulation"
+	description = "Simulated Plugin"
+
+	# This plugin is only added by the simulation
+	register = False
+
+	def init(self, n=0, objects=100, interval=60, data_sources=4, generator="random"):
+		# Give each plugin its own name (and directory)
+		self.name = "%s-%s" % (self.name, n)
+
+		self.interval = interval
+
+		self.count = objects
+		self.data_sources = data_sources
+		self.generator = generator
+
+	@property
+	def objects(self):
+		for n in range(self.count):
+			yield SimulatedObject(self, n, data_sources=self.data_sources,
+				generator=self.generator)
+
+
+class Simulation(object):
+	"""
+		Runs the scheduler and write queue of the daemon with
+		a large number of synthetic plugins and objects
+	"""
+	def __init__(self, plugins=1, objects=1000, interval=60, data_sources=4,
+			generator="random", duration=600, commit_interval=None):
+		if not generator in GENERATORS:
+			raise RuntimeError("Could not find generator %s" % generator)
+
+		self.plugins = plugins
+		self.objects = objects
+		self.interval = interval
+		self.data_sources = data_sources
+		self.generator = generator
+		self.duration = duration
+		self.commit_interval = commit_interval
+
+	def run(self):
+		"""
+			Runs the simulation for the configured duration and returns a report
+		"""
+		database_dir = tempfile.mkdtemp(prefix="collecty-simulation-")
+
+		try:
+			d = daemon.Daemon(database_dir=database_dir, with_bus=False,
+				commit_interval=self.commit_interval)
+
+			for n in range(self.plugins):
+				d.add_plugin(SimulatedPlugin, n=n, objects=self.objects,
+					interval=self.interval, data_sources=self.data_sources,
+					generator=self.generator)
+
+			log.info(_("Simulating %s objects in %s plugins for %ss...") \
+				% (self.objects * self.plugins, self.plugins, self.duration))
+
+			# Stop after the given time
+			d.scheduler.enter(self.duration, -1, d.shutdown)
+
+			time_start = time.perf_counter()
+			cpu_start = time.process_time()
+
+			d.scheduler.run()
+
+			duration = time.perf_counter() - time_start
+			cpu = time.process_time() - cpu_start
+
+			# Write everything that is left
+			d.write_queue.commit()
+
+			return self._report(d, duration, cpu)
+
+		finally:
+			shutil.rmtree(database_dir, ignore_errors=True)
+
+	def _report(self, d, duration, cpu):
+		collections = []
+		overruns = 0
+		skipped = 0
+
+		for plugin in d.plugins:
+			collections += d.stats.pop("collect/%s" % plugin.name)
+			overruns += len(d.stats.pop("overruns/%s" % plugin.name))
+			skipped += len(d.stats.pop("skipped/%s" % plugin.name))
+
+		commits = d.stats.pop("commit/duration")
+		files = d.stats.pop("commit/files")
+
+		# The peak resident set size (in KiB on Linux)
+		max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+		return {
+			"plugins"      : self.plugins,
+			"objects"      : self.plugins * self.objects,
+			"data_sources" : self.data_sources,
+			"interval"     : self.interval,
+			"duration"     : duration,
+			"cpu"          : cpu,
+			"cpu_usage"    : cpu / duration if duration else None,
+			"max_rss"      : max_rss,
+			"disk_usage"   : self._disk_usage(d.database_dir),
+			"collections"  : len(collections),
+			"overruns"     : overruns,
+			"skipped"      : skipped,
+			"collect"      : self._percentiles(collections),
+			"lateness"     : self._percentiles(d.stats.pop("lateness")),
+			"commits"      : len(commits),
+			"commit"       : self._percentiles(commits),
+			"files"        : sum(files),
+		}
+
+	@staticmethod
+	def _disk_usage(path):
+		usage = 0
+
+		for dirpath, dirnames, filenames in os.walk(path):
+			for filename in filenames:
+				usage += os.path.getsize(os.path.join(dirpath, filename))
+
+		return usage
+
+	@staticmethod
+	def _percentiles(values):
+		if not values:
+			return { "p50" : None, "p95" : None, "max" : None }
+
+		p50, p95, max = numpy.percentile(values, (50, 95, 100))
+
+		return { "p50" : float(p50), "p95" : float(p95), "max" : float(max) }
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import collections
+import contextlib
+import threading
+import time
+
+# The number of values that are kept for each key and for how long
+# (in seconds). Older values are dropped so that nothing grows and
+# nothing stale is reported if they are not collected for a while.
+MAX_SAMPLES = 10000
+MAX_AGE     = 600
+
+class Statistics(object):
+	"""
+		Keeps measurements of the daemon itself until they
+		are collected by the collecty plugin
+	"""
+	def __init__(self):
+		self._samples = {}
+
+		# All keys that have ever been recorded
+		self._keys = set()
+
+		# Lock to make this class thread-safe
+		self._lock = threading.Lock()
+
+	def record(self, key, value):
+		"""
+			Records value for key
+		"""
+		now = time.monotonic()
+
+		with self._lock:
+			try:
+				samples = self._samples[key]
+			except KeyError:
+				samples = self._samples[key] = collections.deque(maxlen=MAX_SAMPLES)
+
+			samples.append((now, value))
+
+			# Drop anything that is too old
+			while samples[0][0] < now - MAX_AGE:
+				samples.popleft()
+
+			self._keys.add(key)
+
+	def pop(self, key):
+		"""
+			Returns all values recorded for key since the last
+			call (but not older than MAX_AGE) and resets them
+		"""
+		cutoff = time.monotonic() - MAX_AGE
+
+		with self._lock:
+			samples = self._samples.pop(key, [])
+
+		return [value for t, value in samples if t >= cutoff]
+
+	def keys(self, prefix=""):
+		"""
+			Returns all keys that have ever been recorded and
+			start with prefix
+		"""
+		with self._lock:
+			return sorted(k for k in self._keys if k.startswith(prefix))
+
+	@contextlib.contextmanager
+	def timer(self, key):
+		"""
+			Records how long the block took to run (in seconds)
+		"""
+		time_start = time.perf_counter()
+
+		try:
+			yield
+		finally:
+			self.record(key, time.perf_counter() - time_start)
@@ -19,40 +19,119 @@
 #                                                                             #
 ###############################################################################
 
+import array
+import fnmatch
 import logging
 import os
+import sys
+import tempfile
 
 log = logging.getLogger("collecty.util")
 
 from .constants import *
 
+# All files in procfs and sysfs are read relative to this directory
+ROOT = "/"
+
+def set_root(path):
+	"""
+		Changes the directory in which procfs and sysfs are
+		expected (e.g. to run on a synthetic tree)
+	"""
+	global ROOT
+
+	ROOT = path or "/"
+
+# Network interfaces which are never collected
+DEFAULT_SKIP_INTERFACES = ("lo", "mon.*")
+
+SKIP_INTERFACES = DEFAULT_SKIP_INTERFACES
+
+def set_skip_interfaces(patterns):
+	"""
+		Changes which network interfaces are skipped
+	"""
+	global SKIP_INTERFACES
+
+	if patterns is None:
+		patterns = DEFAULT_SKIP_INTERFACES
+
+	SKIP_INTERFACES = patterns
+
+# If set, all reads from procfs and sysfs are passed to this
+# object instead (to record or replay them)
+READER = None
+
+def set_reader(reader):
+	global READER
+
+	READER = reader
+
+def make_path(*args):
+	"""
+		Returns the real path of a file in procfs or sysfs
+	"""
+	path = os.path.join(*args)
+
+	if ROOT == "/":
+		return path
+
+	return os.path.join(ROOT, path.lstrip("/"))
+
+def open_file(*args):
+	"""
+		Opens a file in procfs or sysfs for reading
+	"""
+	if READER:
+		return READER.open_file(os.path.join(*args))
+
+	return open(make_path(*args))
+
+def listdir(*args):
+	if READER:
+		return READER.listdir(os.path.join(*args))
+
+	return os.listdir(make_path(*args))
+
+def exists(*args):
+	if READER:
+		return READER.exists(os.path.join(*args))
+
+	return os.path.exists(make_path(*args))
+
+def isdir(*args):
+	if READER:
+		return READER.isdir(os.path.join(*args))
+
+	return os.path.isdir(make_path(*args))
+
 def get_network_interfaces():
 	"""
 		Returns all real network interfaces
 	"""
-	for interface in os.listdir("/sys/class/net"):
+	for interface in listdir("/sys/class/net"):
 		# Skip some unwanted interfaces.
-		if interface == "lo" or interface.startswith("mon."):
+		if any(fnmatch.fnmatchcase(interface, p) for p in SKIP_INTERFACES):
 			continue
 
-		path = os.path.join("/sys/class/net", interface)
-		if not os.path.isdir(path):
+		if not isdir("/sys/class/net", interface):
 			continue
 
 		yield interface
 
-def make_interval(interval):
-	intervals = {
-		None   : "-3h",
-		"hour" : "-1h",
-		"day"  : "-25h",
-		"month": "-30d",
-		"week" : "-360h",
-		"year" : "-365d",
-	}
+# All named intervals and how far they reach back
+INTERVALS = {
+	None   : "-3h",
+	"hour" : "-1h",
+	"day"  : "-25h",
+	"month": "-30d",
+	"week" : "-360h",
+	"year" : "-365d",
+}
 
+def make_interval(interval):
 	try:
-		return intervals[interval]
+		return INTERVALS[interval]
 	except KeyError:
 		return "end-%s" % interval
 
@@ -75,6 +154,38 @@ def guess_format(filename):
 	# Otherwise fall back to the default format
 	return DEFAULT_IMAGE_FORMAT
 
+def unpack_values(buffer):
+	"""
+		Unpacks a buffer of little-endian doubles into an array
+	"""
+	a = array.array("d")
+	a.frombytes(buffer)
+
+	if sys.byteorder == "big":
+		a.byteswap()
+
+	return a
+
+def make_memfd(data, name="collecty"):
+	"""
+		Writes data into an anonymous in-memory file and returns
+		a file descriptor which is positioned at the beginning.
+	"""
+	try:
+		fd = os.memfd_create(name, os.MFD_CLOEXEC)
+
+	# Fall back to an unlinked temporary file
+	except (AttributeError, OSError):
+		with tempfile.TemporaryFile() as f:
+			fd = os.dup(f.fileno())
+
+	with open(fd, "wb", closefd=False) as f:
+		f.write(data)
+
+	os.lseek(fd, 0, os.SEEK_SET)
+
+	return fd
+
 class ProcNetSnmpParser(object):
 	"""
 		This class parses /proc/net/snmp{,6} and allows
@@ -92,7 +203,7 @@ class ProcNetSnmpParser(object):
 	def _parse(self):
 		res = {}
 
-		with open("/proc/net/snmp") as f:
+		with open_file("/proc/net/snmp") as f:
 			keys = {}
 
 			for line in f.readlines():
@@ -122,7 +233,7 @@ class ProcNetSnmpParser(object):
 		if self.intf:
 			fn = os.path.join("/proc/net/dev_snmp6", self.intf)
 
-		with open(fn) as f:
+		with open_file(fn) as f:
 			for line in f.readlines():
 				key, val = line.split()
 
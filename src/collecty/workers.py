@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+import logging
+import multiprocessing
+import os
+import signal
+
+from .i18n import _
+
+log = logging.getLogger("collecty.workers")
+
+# Workers are forked so that they can use everything the parent has set up.
+#
+# The daemon has other threads (the bus and the HTTP server) which might
+# hold a lock while we fork. A worker must therefore only call collect()
+# and send back its result, and never use anything that is shared with
+# those threads.
+context = multiprocessing.get_context("fork")
+
+def run(func, timeout):
+	"""
+		Calls func in a forked worker process and returns its result
+
+		The worker is killed if it has not returned after timeout
+		seconds and TimeoutError is raised. The calling thread is
+		blocked while waiting.
+	"""
+	# Reap any workers that have been killed before
+	context.active_children()
+
+	reader, writer = context.Pipe(duplex=False)
+
+	worker = context.Process(target=_work, args=(func, writer), daemon=True)
+	worker.start()
+
+	# We only read from the pipe
+	writer.close()
+
+	try:
+		if not reader.poll(timeout):
+			raise TimeoutError(_("Worker did not return within %ss") % timeout)
+
+		try:
+			success, result = reader.recv()
+
+		# The worker died without sending anything
+		except EOFError:
+			raise RuntimeError(_("Worker exited with code %s") % worker.exitcode)
+
+	finally:
+		reader.close()
+
+		if worker.is_alive():
+			log.debug("Killing worker %s" % worker.pid)
+
+			os.kill(worker.pid, signal.SIGKILL)
+
+		# Don't block on a worker which is stuck in the kernel, it
+		# will be reaped once the kill has been delivered
+		worker.join(0.1)
+
+	if not success:
+		raise result
+
+	return result
+
+def _work(func, writer):
+	try:
+		result = (True, func())
+	except Exception as e:
+		result = (False, e)
+
+	try:
+		writer.send(result)
+
+	# The exception could not be pickled
+	except Exception:
+		writer.send((False, RuntimeError(repr(result[1]))))
+
+	writer.close()
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+import unittest
+
+from collecty import daemon
+
+class GraphCacheTests(unittest.TestCase):
+	def setUp(self):
+		self.cache = daemon.GraphCache()
+
+	def test_key_defaults(self):
+		key = daemon.GraphCache._make_key
+
+		self.assertEqual(
+			key("processor", {}),
+			key("processor", {
+				"object_id" : "default",
+				"format"    : "svg",
+				"width"     : "960",
+				"height"    : 480,
+				"flush"     : False,
+			}),
+		)
+
+	def test_key_differs(self):
+		key = daemon.GraphCache._make_key
+
+		self.assertNotEqual(
+			key("processor", { "interval" : "hour" }),
+			key("processor", { "interval" : "day" }),
+		)
+
+		self.assertNotEqual(
+			key("processor", {}),
+			key("processor", { "thumbnail" : True }),
+		)
+
+	def test_get_and_put(self):
+		self.assertIsNone(self.cache.get("processor", {}))
+
+		self.cache.put("processor", {}, { "image" : b"" })
+
+		self.assertEqual(self.cache.get("processor", {}), { "image" : b"" })
+
+	def test_lru(self):
+		for i in range(self.cache.MAX_GRAPHS):
+			self.cache.put("t", { "object_id" : "%s" % i }, { "image" : b"" })
+
+		# Use the first graph so that the second one is the oldest
+		self.cache.get("t", { "object_id" : "0" })
+
+		self.cache.put("t", { "object_id" : "new" }, { "image" : b"" })
+
+		self.assertIsNotNone(self.cache.get("t", { "object_id" : "0" }))
+		self.assertIsNone(self.cache.get("t", { "object_id" : "1" }))
+		self.assertEqual(len(self.cache._graphs), self.cache.MAX_GRAPHS)
+
+	def test_invalidate(self):
+		self.cache.put("a", {}, { "image" : b"" })
+		self.cache.put("b", {}, { "image" : b"" })
+
+		self.cache.invalidate(["a"])
+
+		self.assertIsNone(self.cache.get("a", {}))
+		self.assertIsNotNone(self.cache.get("b", {}))
+
+		self.cache.invalidate()
+
+		self.assertIsNone(self.cache.get("b", {}))
+
+	def test_stale_put(self):
+		generation = self.cache.generation("a")
+
+		# New data arrives while the graph is being rendered
+		self.cache.invalidate(["a"])
+
+		self.cache.put("a", {}, { "image" : b"" }, generation=generation)
+
+		self.assertIsNone(self.cache.get("a", {}))
+
+	def test_popular(self):
+		for i in range(3):
+			self.cache.hit("a", {})
+
+		self.cache.hit("b", {})
+
+		self.assertEqual(self.cache.popular(1), [("a", {})])
+
+	def test_decay(self):
+		for i in range(4):
+			self.cache.hit("a", {})
+
+		self.cache.hit("b", {})
+
+		self.cache.decay()
+
+		# Requests that have been counted once are forgotten
+		self.assertEqual(self.cache.popular(10), [("a", {})])
+
+		self.cache.decay()
+		self.cache.decay()
+
+		self.assertEqual(self.cache.popular(10), [])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+import numpy
+import unittest
+
+from collecty import live
+
+class RingBufferTests(unittest.TestCase):
+	def test_empty(self):
+		buffer = live.RingBuffer(2, 5)
+
+		timestamps, values = buffer.get()
+
+		self.assertEqual(len(buffer), 0)
+		self.assertEqual(len(timestamps), 0)
+		self.assertEqual(values.shape, (0, 2))
+
+	def test_order(self):
+		buffer = live.RingBuffer(1, 5)
+
+		for i in range(3):
+			buffer.push(i, [i * 10])
+
+		timestamps, values = buffer.get()
+
+		self.assertEqual(list(timestamps), [0, 1, 2])
+		self.assertEqual(list(values[:, 0]), [0, 10, 20])
+
+	def test_wrap_around(self):
+		buffer = live.RingBuffer(1, 5)
+
+		for i in range(12):
+			buffer.push(i, [i])
+
+		timestamps, values = buffer.get()
+
+		self.assertEqual(len(buffer), 5)
+		self.assertEqual(list(timestamps), [7, 8, 9, 10, 11])
+
+	def test_count(self):
+		buffer = live.RingBuffer(1, 5)
+
+		for i in range(12):
+			buffer.push(i, [i])
+
+		timestamps, values = buffer.get(2)
+
+		self.assertEqual(list(timestamps), [10, 11])
+
+
+class Object(object):
+	file = "/test.rrd"
+
+	rrd_schema_types = [
+		("gauge", "GAUGE"),
+		("counter", "DERIVE"),
+	]
+
+	def __str__(self):
+		return "test"
+
+
+class LiveStoreTests(unittest.TestCase):
+	def setUp(self):
+		self.store = live.LiveStore(None)
+		self.object = Object()
+
+		buffer = live.RingBuffer(2, 10)
+
+		for timestamp, values in ((0, [5, 100]), (2, [6, 120]), (4, [7, 50]), (6, [8, 70])):
+			buffer.push(timestamp, values)
+
+		self.store._buffers[self.object.file] = buffer
+
+	def unpack(self, series):
+		return numpy.frombuffer(series, dtype="<f8")
+
+	def test_gauges(self):
+		series = self.store.get_series(self.object)
+
+		self.assertEqual(list(self.unpack(series["series"]["gauge"])), [5, 6, 7, 8])
+
+	def test_rates(self):
+		series = self.store.get_series(self.object)
+
+		rates = self.unpack(series["series"]["counter"])
+
+		# There is no rate for the first sample and after a counter reset
+		self.assertTrue(numpy.isnan(rates[0]))
+		self.assertEqual(rates[1], 10)
+		self.assertTrue(numpy.isnan(rates[2]))
+		self.assertEqual(rates[3], 10)
+
+	def test_forget(self):
+		self.store.forget([self.object.file])
+
+		with self.assertRaises(RuntimeError):
+			self.store.get_series(self.object)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from collecty import recording
+
+class Plugin(object):
+	name = "test"
+
+
+class RecordingTests(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.filename = os.path.join(self.path, "recording.gz")
+
+	def tearDown(self):
+		shutil.rmtree(self.path)
+
+	def record(self, frames):
+		recorder = recording.Recorder(self.filename)
+
+		for i in range(frames):
+			with recorder.frame(Plugin()) as frame:
+				recorder._record("open", "/proc/test", "%s\n" % i)
+
+		recorder.close()
+
+	def test_load(self):
+		self.record(3)
+
+		frames = list(recording.load(self.filename))
+
+		self.assertEqual(len(frames), 3)
+		self.assertEqual(frames[2]["reads"], [["open", "/proc/test", "2\n"]])
+
+	def test_truncated(self):
+		self.record(3)
+
+		# Cut off the end of the compressed stream
+		with open(self.filename, "rb") as f:
+			data = f.read()
+
+		with open(self.filename, "wb") as f:
+			f.write(data[:-10])
+
+		# All complete frames are loaded without an error
+		frames = list(recording.load(self.filename))
+
+		self.assertIn(len(frames), (2, 3))
+
+	def test_incomplete_line(self):
+		self.record(2)
+
+		# Append half a frame
+		with gzip.open(self.filename, "at") as f:
+			f.write("{\"plugin\":")
+
+		frames = list(recording.load(self.filename))
+
+		self.assertEqual(len(frames), 2)
+
+	def test_replay(self):
+		self.record(2)
+
+		player = recording.Player(self.filename)
+		player.set_frame(player.frames[1])
+
+		with player.open_file("/proc/test") as f:
+			self.assertEqual(f.read(), "1\n")
+
+		with self.assertRaises(FileNotFoundError):
+			player.open_file("/proc/missing")
+
+
+if __name__ == "__main__":
+	unittest.main()
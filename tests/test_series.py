@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+import numpy
+import unittest
+
+from collecty import series
+
+class LTTBTests(unittest.TestCase):
+	def setUp(self):
+		self.x = numpy.arange(1000, dtype=numpy.float64)
+		self.y = numpy.sin(self.x / 50)
+
+	def test_short_series(self):
+		selected = series.lttb(self.x[:10], self.y[:10], 100)
+
+		self.assertEqual(list(selected), list(range(10)))
+
+	def test_number_of_points(self):
+		selected = series.lttb(self.x, self.y, 100)
+
+		self.assertEqual(len(selected), 100)
+
+	def test_keeps_first_and_last(self):
+		selected = series.lttb(self.x, self.y, 100)
+
+		self.assertEqual(selected[0], 0)
+		self.assertEqual(selected[-1], len(self.x) - 1)
+
+	def test_ordered(self):
+		selected = series.lttb(self.x, self.y, 100)
+
+		self.assertTrue(numpy.all(numpy.diff(selected) > 0))
+
+	def test_keeps_peaks(self):
+		y = numpy.zeros(1000)
+		y[500] = 100
+
+		selected = series.lttb(self.x, y, 50)
+
+		self.assertIn(500, selected)
+
+	def test_skips_unknown_values(self):
+		y = self.y.copy()
+		y[100:900] = numpy.nan
+
+		selected = series.lttb(self.x, y, 100)
+
+		# Unknown values are only selected if a bucket has nothing else
+		known = numpy.count_nonzero(~numpy.isnan(y[selected]))
+		self.assertGreater(known, 2)
+
+
+class MinMaxTests(unittest.TestCase):
+	def test_buckets(self):
+		values = numpy.arange(10, dtype=numpy.float64).reshape(-1, 1)
+
+		size, average, minimum, maximum = series.minmax(values, 5)
+
+		self.assertEqual(size, 2)
+		self.assertEqual(list(average[:, 0]), [0.5, 2.5, 4.5, 6.5, 8.5])
+		self.assertEqual(list(minimum[:, 0]), [0, 2, 4, 6, 8])
+		self.assertEqual(list(maximum[:, 0]), [1, 3, 5, 7, 9])
+
+	def test_uneven(self):
+		values = numpy.arange(7, dtype=numpy.float64).reshape(-1, 1)
+
+		size, average, minimum, maximum = series.minmax(values, 3)
+
+		self.assertEqual(size, 3)
+		self.assertEqual(list(maximum[:, 0]), [2, 5, 6])
+
+	def test_unknown_bucket(self):
+		values = numpy.array([[1], [numpy.nan], [numpy.nan], [3]], dtype=numpy.float64)
+
+		size, average, minimum, maximum = series.minmax(values, 4)
+
+		self.assertTrue(numpy.isnan(average[1, 0]))
+		self.assertEqual(average[3, 0], 3)
+
+	def test_columns(self):
+		values = numpy.array([[1, 10], [2, 20], [3, 30], [4, 40]], dtype=numpy.float64)
+
+		size, average, minimum, maximum = series.minmax(values, 2)
+
+		self.assertEqual(average.shape, (2, 2))
+		self.assertEqual(list(average[:, 1]), [15, 35])
+
+
+class PackTests(unittest.TestCase):
+	def test_pack(self):
+		packed = series.pack([1.0, numpy.nan])
+
+		values = numpy.frombuffer(packed, dtype="<f8")
+
+		self.assertEqual(values[0], 1.0)
+		self.assertTrue(numpy.isnan(values[1]))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+###############################################################################
+#                                                                             #
+# collecty - A system statistics collection daemon for IPFire                 #
+# Copyright (C) 2026 IPFire development team                                  #
+#                                                                             #
+# This program is free software: you can redistribute it and/or modify        #
+# it under the terms of the GNU General Public License as published by        #
+# the Free Software Foundation, either version 3 of the License, or           #
+# (at your option) any later version.                                         #
+#                                                                             #
+# This program is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the               #
+# GNU General Public License for more details.                                #
+#                                                                             #
+# You should have received a copy of the GNU General Public License           #
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.       #
+#                                                                             #
+###############################################################################
+
+
+import unittest
+import unittest.mock
+
+from collecty import stats
+
+class StatisticsTests(unittest.TestCase):
+	def setUp(self):
+		self.stats = stats.Statistics()
+
+	def test_pop(self):
+		self.stats.record("a", 1)
+		self.stats.record("a", 2)
+
+		self.assertEqual(self.stats.pop("a"), [1, 2])
+
+		# Everything has been reset
+		self.assertEqual(self.stats.pop("a"), [])
+
+	def test_keys(self):
+		self.stats.record("bus/a", 1)
+		self.stats.record("bus/b", 1)
+		self.stats.record("render", 1)
+
+		self.stats.pop("bus/a")
+
+		# Keys are remembered even after they have been popped
+		self.assertEqual(self.stats.keys("bus/"), ["bus/a", "bus/b"])
+
+	def test_max_samples(self):
+		for i in range(stats.MAX_SAMPLES + 10):
+			self.stats.record("a", i)
+
+		values = self.stats.pop("a")
+
+		self.assertEqual(len(values), stats.MAX_SAMPLES)
+		self.assertEqual(values[0], 10)
+
+	def test_max_age(self):
+		with unittest.mock.patch("time.monotonic", return_value=1000):
+			self.stats.record("a", 1)
+
+		with unittest.mock.patch("time.monotonic", return_value=1000 + stats.MAX_AGE + 1):
+			self.stats.record("a", 2)
+
+			self.assertEqual(self.stats.pop("a"), [2])
+
+	def test_timer(self):
+		with self.stats.timer("a"):
+			pass
+
+		values = self.stats.pop("a")
+
+		self.assertEqual(len(values), 1)
+		self.assertGreaterEqual(values[0], 0)
+
+
+if __name__ == "__main__":
+	unittest.main()